@@ -1,7 +1,7 @@
 import numpy as np
 from classes import Classifieur
 
-from Utilitaires.pca import pca
+from Utilitaires.pca import PCA
 
 
 def Apprentissage(vecteurs, auteurs, seuil=0.5, pas=0.1, composantes=50):
@@ -118,8 +118,9 @@ def Test(Inconnus, Result):
         
 class Apriori(Classifieur):
     
-    def __init__(self):
+    def __init__(self, nb_composantes = 50):
         #print("Création du classifieur Apriori")
+        self.nb_composantes = nb_composantes
         self.eval_set = None
         self.training_set = None
         self.p = None
@@ -134,14 +135,13 @@ class Apriori(Classifieur):
         self.categories = categories
         vecteurs_training = [t.vecteur for t in training_set]
         auteurs_training = [t.categorie for t in training_set]
-        t = len(vecteurs_training)
         vecteurs_eval = [t.vecteur for t in eval_set]
         auteurs_eval = [t.categorie for t in eval_set]
-        vecteurs = vecteurs_training + vecteurs_eval
-        vecteurs = pca(vecteurs)
-        vecteurs_training = vecteurs[0:t]
-        vecteurs_eval = vecteurs[t:len(vecteurs)]
-        Intermediaires = Apprentissage(vecteurs_training, auteurs_training)
+        # Les axes sont appris sur le training_set seul, et seuls les nb_composantes premiers servent à Apprentissage
+        my_pca = PCA(self.nb_composantes).fit(vecteurs_training)
+        vecteurs_training = list(my_pca.transform(vecteurs_training))
+        vecteurs_eval = list(my_pca.transform(vecteurs_eval))
+        Intermediaires = Apprentissage(vecteurs_training, auteurs_training, composantes = self.nb_composantes)
         Probabilite = Test(vecteurs_eval, Intermediaires[1])
         self.p = Probabilite
         self.auteurs = Intermediaires[0]
@@ -1,9 +1,8 @@
 import pickle
 from classes import *
-from math import sqrt
 from math import pi
-from math import e
 import numpy as np
+from scipy import sparse
 
 
 
@@ -11,103 +10,150 @@ import numpy as np
 #auteurs est une liste de même taille que exemples telle que auteur[i] soit l'auteur de exemples[i]
 
 def f(vecteur_training, categorie_training, categories):
-    k = len(vecteur_training) #compte le nombre de vecteurs
-    n = len(categories) #compte le nombre de categories
-    m = len(vecteur_training[0]) #compte le nombre de coordonnées d'un vecteur
-    #on veut convertir training_set en un tableau Classes de numpy où les vecteurs sont rassemblés par catégorie
-    Classes = [0]*n #initialisation de Classes
-    Test = [True]*n
-    for j in range(k): #on parcourt les vecteurs
-        texte = np.asarray(vecteur_training[j]) #on convertit le vecteur en numpy
-        c = categories.index(categorie_training[j])
-        if(Test[c]):
-            Classes[c] = [texte]
-            Test[c] = False
-        else:
-            Classes[c] += [texte]
-    
-    moyenne = np.zeros((n,m)) #Tableau destiné à contenir le vecteur moyen de chaque catégorie
-    ecart_type = np.zeros((n,m)) #Tableau destiné à contenir le vecteur écart-type de chaque catégorie
-    
-    for i in range(n):
-       moyenne[i] = np.mean(Classes[i], 0)
-       ecart_type[i] = np.sqrt(np.var(Classes[i], 0))       
-    return moyenne, ecart_type
+    """Renvoie les tableaux (nb_categories, nb_coordonnees) des moyennes et écarts-types des vecteurs de chaque catégorie."""
+    effectifs, moyenne, variance = statistiques_categories(np.asarray(vecteur_training, dtype=float), indices_categories(categorie_training, categories), len(categories))
+    return moyenne, np.sqrt(variance)
 
+def indices_categories(categorie_training, categories):
+    index = {c : j for j, c in enumerate(categories)}
+    return np.array([index[c] for c in categorie_training], dtype=int)
 
-def g(moyenne, ecart_type, inconnus):
-    m = len(inconnus) #nombre de vecteurs de texte inconnus
-    n = moyenne.shape[1] #nombre de coordonnées d'un vecteur
-    k = moyenne.shape[0] #nombre de catégories
+def statistiques_categories(X, codes, n):
+    """Effectif, moyenne et variance de chaque coordonnée pour chacune des n catégories, codes donnant la catégorie de chaque ligne de X."""
+    indicatrice = sparse.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))), shape = (n, len(codes)))
+    effectifs = np.bincount(codes, minlength = n).astype(float)
+    diviseurs = np.maximum(effectifs, 1)[:, None]
+    moyenne = indicatrice.dot(X) / diviseurs
+    variance = indicatrice.dot((X - moyenne[codes])**2) / diviseurs
+    return effectifs, moyenne, variance
 
-    Probabilite  = np.ones((m,k)) #Création de la matrice stochastique de résultats
+def log_vraisemblances(moyenne, variance, inconnus):
+    """Logarithme de la densité gaussienne (coordonnées indépendantes) de chaque vecteur inconnu pour chaque catégorie, calculé par produits matriciels :
+    somme des (x - m)²/v = x².(1/v) - 2 x.(m/v) + somme des m²/v"""
+    X = np.asarray(inconnus, dtype=float)
+    inverses = 1 / variance
+    carres = np.dot(X**2, np.transpose(inverses)) - 2 * np.dot(X, np.transpose(moyenne * inverses)) + np.sum(moyenne**2 * inverses, axis = 1)[None, :]
+    return -0.5 * (np.sum(np.log(2 * pi * variance), axis = 1)[None, :] + carres)
 
-    #Remplissage de la matrice
-    for i in range (m): 
-        for l in range(k):
-            for j in range(n):
-                if ecart_type[l][j] != 0:
-                    p = 1/(sqrt(2*pi)*ecart_type[l][j]) * e**(-1/2*((inconnus[i][j]-moyenne[l][j])/ecart_type[l][j])**2)
-                else:
-                    p = 0
-                Probabilite[i][l] *= p
-    
-    return Probabilite
+def probabilites(L):
+    """Normalise les log-vraisemblances L (une ligne par texte) en probabilités, sans passer par les densités qui s'annulent en grande dimension."""
+    L = L - L.max(axis = 1)[:, None]
+    P = np.exp(L)
+    return P / P.sum(axis = 1)[:, None]
+
+def lisser(variance, lissage):
+    """Ajoute aux variances (une ligne par catégorie) lissage fois la plus grande d'entre elles, pour que les coordonnées constantes dans une catégorie ne l'excluent pas."""
+    return variance + lissage * max(variance.max(), 1e-12)
+
+def g(moyenne, ecart_type, inconnus, lissage = 1e-9):
+    """Matrice des probabilités d'appartenance de chaque vecteur inconnu à chaque catégorie (a priori uniforme), les variances étant lissées par lisser comme dans Bayes."""
+    return probabilites(log_vraisemblances(moyenne, lisser(ecart_type**2, lissage), inconnus))
 
 class Bayes(Classifieur):
+    """Classifieur bayésien naïf gaussien. partial_fit met à jour les statistiques de chaque catégorie avec de nouveaux textes (formules de Chan), sans reprendre les anciens.
+    - lissage = part de la plus grande variance d'une coordonnée dans une catégorie ajoutée à toutes les variances (voir lisser)
+    - a_priori = si vrai, les probabilités tiennent compte de la proportion de chaque catégorie dans le training_set ; sinon l'a priori est uniforme"""
     
-    def __init__(self):
+    def __init__(self, lissage = 1e-9, a_priori = False):
         #print("Création du classifieur Bayes")
         self.eval_set = None
         self.training_set = None
         self.p = None
         self.p_ref = None
         self.precision = None
-        pass
+        self.lissage = lissage
+        self.a_priori = a_priori
+        self.categories = None
+        self.effectifs = None
+        self.moyenne = None
+        self.variance = None
+
+    def partial_fit(self, textes, categories = None):
+        """Ajoute les textes aux statistiques des catégories. categories n'est nécessaire qu'au premier appel : les catégories ne peuvent plus changer ensuite."""
+        if self.effectifs is None:
+            if categories is None:
+                raise ValueError("Les catégories doivent être données au premier appel de partial_fit")
+            self.categories = categories
+        elif categories is not None and list(categories) != list(self.categories):
+            raise ValueError("Les catégories {} ne sont pas celles du classifieur déjà appris : {}".format(categories, self.categories))
+        inconnues = {t.categorie for t in textes} - set(self.categories)
+        if inconnues:
+            raise ValueError("Catégories inconnues du classifieur : {}".format(sorted(inconnues, key = str)))
+        X = np.array([t.vecteur for t in textes], dtype=float)
+        effectifs, moyenne, variance = statistiques_categories(X, indices_categories([t.categorie for t in textes], self.categories), len(self.categories))
+        if self.effectifs is None:
+            self.effectifs, self.moyenne, self.variance = effectifs, moyenne, variance
+        else:
+            total = self.effectifs + effectifs
+            diviseurs = np.maximum(total, 1)[:, None]
+            delta = moyenne - self.moyenne
+            M2 = self.variance * self.effectifs[:, None] + variance * effectifs[:, None] + delta**2 * (self.effectifs * effectifs)[:, None] / diviseurs
+            self.moyenne = self.moyenne + delta * effectifs[:, None] / diviseurs
+            self.variance = M2 / diviseurs
+            self.effectifs = total
+        return self
+
+    def fit(self, textes, categories):
+        self.effectifs = None
+        return self.partial_fit(textes, categories)
+
+    def variances_lissees(self):
+        return lisser(self.variance, self.lissage)
+
+    def predire(self, vecteurs):
+        """Matrice des probabilités d'appartenance de chaque vecteur à chaque catégorie."""
+        L = log_vraisemblances(self.moyenne, self.variances_lissees(), vecteurs)
+        if self.a_priori:
+            with np.errstate(divide = "ignore"):
+                L = L + np.log(self.effectifs / self.effectifs.sum())[None, :]
+        return probabilites(L)
+    
+    def predictions_leave_one_out(self, textes, categories):
+        """Renvoie, pour chaque texte, l'indice de la catégorie prédite par le modèle appris sur tous les autres textes, comme si on appelait classifier N fois.
+        Les statistiques sans le texte i s'obtiennent en retirant x_i de celles de sa catégorie : une seule passe au lieu de N apprentissages."""
+        self.fit(textes, categories)
+        X = np.array([t.vecteur for t in textes], dtype=float)
+        codes = indices_categories([t.categorie for t in textes], categories)
+        N = len(textes)
+        # Statistiques de la catégorie de chaque texte, privée de ce texte
+        n = self.effectifs[codes][:, None]
+        moyenne = self.moyenne[codes]
+        reste = n - 1
+        diviseurs = np.maximum(reste, 1)
+        moyenne_sans = np.where(reste > 0, (n * moyenne - X) / diviseurs, 0)
+        variance_sans = np.where(reste > 0, np.maximum(self.variance[codes] * n - (X - moyenne) * (X - moyenne_sans), 0) / diviseurs, 0)
+        # Plus grande variance sans le texte i, pour le lissage : celle de sa catégorie privée de i ou celle d'une autre catégorie
+        maximums = self.variance.max(axis = 1)
+        maximums_autres = np.array([np.delete(maximums, l).max(initial = 0) for l in range(len(categories))])
+        epsilons = self.lissage * np.maximum(np.maximum(variance_sans.max(axis = 1), maximums_autres[codes]), 1e-12)
+        L = np.empty((N, len(categories)))
+        for l in range(len(categories)):
+            propre = codes == l
+            m = np.where(propre[:, None], moyenne_sans, self.moyenne[l][None, :])
+            v = np.where(propre[:, None], variance_sans, self.variance[l][None, :]) + epsilons[:, None]
+            L[:, l] = -0.5 * (np.sum(np.log(2 * pi * v), axis = 1) + np.sum((X - m)**2 / v, axis = 1))
+            if self.a_priori:
+                effectifs = self.effectifs[l] - propre
+                with np.errstate(divide = "ignore"):
+                    L[:, l] += np.log(effectifs / (N - 1))
+        return np.argmax(L, axis = 1)
     
     def classifier(self, training_set, eval_set, categories):
         self.eval_set = eval_set
         self.training_set = training_set
-        self.categories = categories
-        vecteurs_eval = [t.vecteur for t in eval_set]
-        categories_eval = [t.categorie for t in eval_set]
-        vecteur_training = [t.vecteur for t in training_set]
-        categorie_training = [t.categorie for t in training_set]
-        Intermediaires = f(vecteur_training, categorie_training, categories)
-        Probabilite = g(Intermediaires[0], Intermediaires[1], vecteurs_eval)
-        #print(Intermediaires[1])
+        self.fit(training_set, categories)
+        Probabilite = self.predire([t.vecteur for t in eval_set])
         self.p = Probabilite
-        k = np.shape(Probabilite)[1]
-        m = np.shape(Probabilite)[0]
+        m, k = Probabilite.shape
+        predictions = np.argmax(Probabilite, axis = 1)
         Reference = np.zeros((m,k))
-        vrai = 0
-        faux = 0
-        clusters = []
-        cat = ['none']*len(categories)
-        c = -1
-        for i in range(m):
-            max = Probabilite[i][0]
-            categorie = 0
-            for j in range(k):
-                if(Probabilite[i][j]>max):
-                    max = Probabilite[i][j]
-                    categorie = j
-            if(cat[categorie]=='none'):
-                clusters += [[eval_set[i]]]
-                c += 1
-                cat[categorie] = c
-            else:
-                clusters[cat[categorie]] += [eval_set[i]]
-            ref = categories.index(categories_eval[i])
-            if(ref==categorie):
-                vrai += 1
-            else:
-                faux += 1
-            Reference[i][ref] = 1
+        Reference[np.arange(m), indices_categories([t.categorie for t in eval_set], categories)] = 1
         self.p_ref = Reference
+        clusters = []
+        cat = {}
+        for t, categorie in zip(eval_set, predictions):
+            if categorie not in cat:
+                cat[categorie] = len(clusters)
+                clusters.append([])
+            clusters[cat[categorie]].append(t)
         self.clusters = clusters
-
-                
-        
-            
-            
\ No newline at end of file
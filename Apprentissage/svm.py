@@ -1,4 +1,5 @@
 from sklearn.svm import SVC
+from scipy import sparse
 from Utilitaires.pca import pca
 from classes import *
 
@@ -52,21 +53,30 @@ class SVM(Classifieur):
         self.eval_set = eval_set
         self.categories = categories
         vecteurs = [t.vecteur for t in self.liste_textes]
-        nouveaux_vecteurs = pca(vecteurs)
-        if self.pc:
-            for k in range(len(self.liste_textes)):
-                self.liste_textes[k].vecteur_pca = nouveaux_vecteurs[k][:max(self.nombre_composantes, len(nouveaux_vecteurs[k]))]
+        if sparse.issparse(vecteurs[0]):
+            # Vecteurs creux (n-grammes) : pas de PCA, SVC travaille directement sur les matrices creuses
+            for t in self.liste_textes:
+                t.vecteur_pca = t.vecteur
+            vecteurs_training = sparse.vstack([t.vecteur_pca for t in self.training_set]).tocsr()
         else:
-            for k in range(len(self.liste_textes)):
-                self.liste_textes[k].vecteur_pca = vecteurs[k][:max(self.nombre_composantes, len(nouveaux_vecteurs[k]))]
-        vecteurs_training = np.array([t.vecteur_pca for t in self.training_set])
+            if self.pc:
+                nouveaux_vecteurs = pca(vecteurs, self.nombre_composantes)
+                for k in range(len(self.liste_textes)):
+                    self.liste_textes[k].vecteur_pca = nouveaux_vecteurs[k]
+            else:
+                for k in range(len(self.liste_textes)):
+                    self.liste_textes[k].vecteur_pca = vecteurs[k]
+            vecteurs_training = np.array([t.vecteur_pca for t in self.training_set])
         categories_training = np.array([t.categorie for t in self.training_set])
         clf = SVC(kernel = self.kernel, gamma=self.gamma, C=self.C)
         clf.fit(vecteurs_training, categories_training)
         classification = []
         for t in self.eval_set:
             categorie_reelle = t.categorie
-            categorie_supposee = clf.predict([t.vecteur_pca])[0]
+            if sparse.issparse(t.vecteur_pca):
+                categorie_supposee = clf.predict(t.vecteur_pca)[0]
+            else:
+                categorie_supposee = clf.predict([t.vecteur_pca])[0]
             classification.append((t, categorie_reelle, categorie_supposee))
         self.classification = classification
         self.clusters = self.classification_to_clusters()
@@ -1,33 +1,51 @@
-from classes import Texte,Analyseur,FonctionAnalyse
+from classes import Texte,Analyseur,FonctionAnalyse,ecrire_colonnes
 from Carac.carac_gramm import Markov_Gram
 from Utilitaires.stats import *
 from Utilitaires.lettres import *
 from Utilitaires.product import *
-import nltk
 import numpy as np
 
 
 class Complexite_Grammaticale(FonctionAnalyse):
 
+    # L'écart est mesuré à la moyenne M de tous les textes
+    locale = False
+
     def __init__(self, langue, saut):
         self.langue = langue
         self.saut = saut
         nom = "Complexité grammaticale ordre {}".format(self.saut)
         composantes = ["Ecart au style canonique Linfini ordre {} ".format(self.saut),"Ecart au style canonique Frobenius ordre {} ".format(self.saut)]
         super(Complexite_Grammaticale,self).__init__(nom,composantes)
+        self.markov_gram = Markov_Gram(self.langue,self.saut, False)
 
-    def analyser(self, liste_textes):
+    def cle(self):
+        # Mêmes statistiques que markov_gram : les comptes de transitions aplatis
+        return self.markov_gram.cle()
 
-        markov_gram = Markov_Gram(self.langue,self.saut, False)
+    additive = True
 
-        N = len(markov_gram.natures)
-        M = np.zeros((N,N))
+    def jonction(self, oeuvre, position, taille):
+        return self.markov_gram.jonction(oeuvre, position, taille)
 
-        P = []
+    def preparer(self, cache):
+        super(Complexite_Grammaticale, self).preparer(cache)
+        self.markov_gram.preparer_transitions(cache)
 
+    def statistiques(self, liste_textes, cache):
         for t in liste_textes:
-            p = markov_gram.estimer(t)
-            P.append(markov_gram.estimer(t))
+            yield self.markov_gram.comptes(t, cache).ravel()
+
+    def finaliser(self, liste_textes, statistiques, cache):
+        ecrire_colonnes(cache, self, liste_textes, self.ecarts(liste_textes, list(statistiques)))
+
+    def ecarts(self, liste_textes, P):
+
+        N = len(self.markov_gram.natures)
+        M = np.zeros((N,N))
+
+        P = [transitions_depuis_comptes(np.reshape(p, (N,N))) for p in P]
+        for p in P:
             M+=p
 
         M = M/ (len(liste_textes))
@@ -35,8 +53,7 @@ class Complexite_Grammaticale(FonctionAnalyse):
         for i in range(len(liste_textes)):
             t = liste_textes[i]
             p = P[i]
-            v = [np.max(np.abs(p-M)),np.trace((p-M).dot((p-M).transpose()))]
-            t.vecteur += v
+            yield [np.max(np.abs(p-M)),np.trace((p-M).dot((p-M).transpose()))]
 
 
 class Complexite_Vocabulaire(FonctionAnalyse):
@@ -47,14 +64,13 @@ class Complexite_Vocabulaire(FonctionAnalyse):
         composantes = ["vocabulaire / mots", "sqrt(vocabulaire)/ ots", "log(vocabulaire)/log(mots)"]
         super(Complexite_Vocabulaire,self).__init__(nom,composantes)
 
-    def analyser(self, liste_textes):
+    def cle(self):
+        return "Complexite_Vocabulaire"
+
+    def vecteurs(self, liste_textes, cache):
 
-        n = 200
         for t in liste_textes:
             N = len(t.racines)
-            V = len(set(t.racines))
-            fdist = nltk.FreqDist(t.racines)
-            p = [x[1] for x in fdist.most_common(n)]
-            v = [V / N, np.sqrt(V) / N, np.log(V) / np.log(N)]
-            t.vecteur+= v
+            V = t.nb_distincts("racines")
+            yield [V / N, np.sqrt(V) / N, np.log(V) / np.log(N)]
 
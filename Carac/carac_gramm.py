@@ -1,4 +1,4 @@
-from classes import Texte,Analyseur,FonctionAnalyse
+from classes import Texte,Analyseur,FonctionAnalyse,reserver_colonnes,ecrire_colonnes,emonder_colonnes
 from Utilitaires.stats import *
 import numpy as np
 
@@ -32,11 +32,18 @@ class Freq_Gram(FonctionAnalyse):
             composantes.append("Fréquence de la catégorie grammaticale {}".format(n))
         super(Freq_Gram,self).__init__(nom,composantes)
 
-    def analyser(self, liste_textes):
+    def cle(self):
+        return "Freq_Gram-{}".format(self.langue)
+
+    additive = True
+
+    def statistiques(self, liste_textes, cache):
 
         for t in liste_textes:
-            v = freqs(t.POS, self.natures)
-            t.vecteur+= v
+            yield comptes_codes(t.codes("POS", self.natures), len(self.natures))
+
+    def composantes(self, comptes):
+        return frequences(comptes)
 
 class Markov_Gram(FonctionAnalyse):
 
@@ -45,6 +52,8 @@ class Markov_Gram(FonctionAnalyse):
         self.langue = langue
         self.saut = saut
         self.emondage = emondage
+        # L'émondage dépend de tous les textes
+        self.locale = not emondage
         if self.langue == "fr":
             self.natures = ["ABR", "ADJ", "ADV", "DET:ART", "DET:POS", "INT", "KON", "NAM", "NOM", "NUM", "PRO", "PRO:DEM",
                        "PRO:IND",
@@ -71,41 +80,96 @@ class Markov_Gram(FonctionAnalyse):
                 composantes.append("Fréquence {}-transition {} -> {}".format(saut,i,j))
         super(Markov_Gram,self).__init__(nom,composantes)
 
-    def analyser(self, liste_textes):
-
-        if self.emondage:
-            res = np.zeros((len(liste_textes),len(self.natures)**2))
-
-            for k in range(len(liste_textes)):
-                res[k,:] = markov(self.saut,liste_textes[k].POS, self.natures)
-
+    def cle(self):
+        # Les statistiques sont les N² comptes de transitions avant émondage : elles ne dépendent pas de emondage
+        return "Markov_Gram-{}-{}".format(self.langue, self.saut)
 
-            N = len(self.natures)
+    def preparer(self, cache):
+        # Toujours N² colonnes : avec emondage, liste_composantes ne garde que celles de la dernière analyse
+        reserver_colonnes(cache, self, len(self.natures)**2)
+        self.preparer_transitions(cache)
 
+    def preparer_transitions(self, cache):
+        preparer_transitions(cache, self.natures, self.saut)
 
-            self.liste_composantes = []
-
-            for i in range(N):
-                for j in range(N):
-                    if np.sum(abs(res[:,i*N+j]))!=0:
-                        self.liste_composantes.append("Fréquence {}-transition {} -> {}".format(self.saut,self.natures[i],self.natures[j]))
-                        for k in range(len(liste_textes)):
-                            liste_textes[k].vecteur.append(res[k,i*N+j])
-        else:
-            for t in liste_textes:
-                t.vecteur += markov(self.saut, t.POS, self.natures)
+    additive = True
 
+    def statistiques(self, liste_textes, cache):
+        for t in liste_textes:
+            yield self.comptes(t, cache).ravel()
 
+    def composantes(self, comptes):
+        N = len(self.natures)
+        return transitions_depuis_comptes(np.reshape(comptes, (N,N))).ravel()
 
+    def jonction(self, oeuvre, position, taille):
+        if self.saut > taille:
+            return None
+        codes = oeuvre.vocabulaire.table(self.natures)[oeuvre.flux("POS")[position - self.saut:position + self.saut]]
+        return comptes_sauts([self.saut], codes, len(self.natures))[self.saut].ravel()
 
+    def finaliser(self, liste_textes, statistiques, cache):
 
+        if not self.emondage:
+            return super(Markov_Gram, self).finaliser(liste_textes, statistiques, cache)
 
-    def estimer(self,texte):
-        v =  markov(self.saut,texte.POS, self.natures)
+        statistiques = (self.composantes(s) for s in statistiques)
         N = len(self.natures)
-        m = np.zeros((N,N))
-        for idx in range(len(v)):
-            i = idx // N
-            j = idx % N
-            m[i,j] = v[idx]
-        return m
\ No newline at end of file
+        noms = ["Fréquence {}-transition {} -> {}".format(self.saut,i,j) for i in self.natures for j in self.natures]
+
+        if id(self) in cache.get("colonnes", {}):
+            # Les N² colonnes réservées sont remplies en place, celles qui restent nulles seront retirées de la matrice à la fin de l'analyse
+            ecrire_colonnes(cache, self, liste_textes, statistiques)
+            debut, fin = cache["colonnes"][id(self)]
+            garder = np.any(cache["matrice"][:, debut:fin] != 0, axis=0)
+            emonder_colonnes(cache, self, garder)
+        else:
+            res = np.zeros((len(liste_textes),N**2))
+            for k, v in enumerate(statistiques):
+                res[k,:] = v
+            garder = np.any(res != 0, axis=0)
+            for k in range(len(liste_textes)):
+                liste_textes[k].vecteur += list(res[k, garder])
+
+        self.liste_composantes = [noms[c] for c in range(N**2) if garder[c]]
+
+    def estimer(self, texte, cache = None):
+        """Renvoie la matrice (N, N) des fréquences de saut-transitions entre natures de texte."""
+        return transitions_depuis_comptes(self.comptes(texte, cache))
+
+    def comptes(self, texte, cache = None):
+        """Renvoie la matrice (N, N) des nombres de saut-transitions entre natures de texte."""
+        if cache is None:
+            cache = {}
+            self.preparer_transitions(cache)
+        return transitions(cache, texte, self.natures, self.saut)
+
+
+def preparer_transitions(cache, natures, saut):
+    """Déclare dans le cache d'une analyse qu'une fonction lira, pour chaque texte, les saut-transitions entre natures."""
+    entree = cache.setdefault(("transitions", tuple(natures)), {"lecteurs": {}, "textes": {}})
+    entree["lecteurs"][saut] = entree["lecteurs"].get(saut, 0) + 1
+
+def transitions(cache, texte, natures, saut):
+    """Renvoie la matrice des nombres de saut-transitions entre natures de texte. Au premier appel pour un texte, les transitions de tous les sauts déclarés dans le cache sont comptées ensemble, en un seul passage sur les POS du texte.
+    Les matrices d'un texte sont retirées du cache dès que chaque saut déclaré a été lu par toutes les fonctions qui l'ont déclaré : le cache ne garde que les textes dont la lecture n'est pas terminée."""
+    cle = ("transitions", tuple(natures))
+    if cle not in cache or saut not in cache[cle]["lecteurs"]:
+        preparer_transitions(cache, natures, saut)
+    entree = cache[cle]
+    restants = entree["textes"].get(id(texte))
+    if restants is None:
+        lecteurs = entree["lecteurs"]
+        matrices = comptes_sauts(sorted(lecteurs), texte.codes("POS", natures), len(natures))
+        restants = {s : [matrices[s], lecteurs[s]] for s in lecteurs}
+        entree["textes"][id(texte)] = restants
+    elif saut not in restants:
+        # Saut déjà lu par tous ses lecteurs déclarés : on le recompte seul, sans le garder
+        return comptes_sauts([saut], texte.codes("POS", natures), len(natures))[saut]
+    matrice = restants[saut][0]
+    restants[saut][1] -= 1
+    if restants[saut][1] <= 0:
+        del restants[saut]
+        if len(restants) == 0:
+            del entree["textes"][id(texte)]
+    return matrice
@@ -1,16 +1,21 @@
-from classes import Texte,Analyseur,FonctionAnalyse
+from classes import Texte,Analyseur,FonctionAnalyse,reserver_colonnes,ajouter_bloc_creux
 from Utilitaires.stats import *
 from Utilitaires.lettres import *
 from Utilitaires.product import *
+from scipy import sparse
+import numpy as np
 
 class Freq_Ngrammes(FonctionAnalyse):
 
-    def __init__(self, langue, n):
+    def __init__(self, langue, n, creux = False):
+        """Si creux est vrai, les fréquences sont données sous forme de matrice creuse lorsque l'analyse est faite par Analyseur.vectoriser.
+        Seul le SVM accepte pour l'instant des vecteurs creux : creux n'est à utiliser qu'avec lui, pour n >= 3."""
         self.natures = []
         self.langue = langue
         self.n = n
         self.lettres = ["a", "z", "e", "r", "t", "y", "u", "i", "o", "p", "q", "s", "d", "f", "g", "h", "j", "k", "l", "m", "w",
            "x", "c", "v", "b", "n"]
+        self.creux = creux
 
 
         nom = "Frequences des {}-grammes".format(self.n)
@@ -19,18 +24,45 @@ class Freq_Ngrammes(FonctionAnalyse):
             composantes.append("Fréquence du {}-gramme {}".format(self.n,"".join(l)))
         super(Freq_Ngrammes,self).__init__(nom,composantes)
 
-    def analyser(self, liste_textes):
+    def cle(self):
+        if self.creux:
+            return None
+        return "Freq_Ngrammes-{}-{}".format(self.langue, self.n)
 
+    def codes_ngrammes(self, t):
+        """Renvoie les indices, dans l'ordre des composantes, des n-grammes de lettres successifs (sans chevauchement) de t.texte_brut, en omettant ceux qui contiennent autre chose qu'une lettre.
+        L'indice du n-gramme l1...ln est calculé directement en base 26 à partir des positions des li dans lettres (self.lettres est dans le même ordre)."""
+        codes = codes_lettres(t.texte_brut.lower(), self.langue)
+        debuts = np.arange(0, len(codes) - self.n, self.n)
+        grammes = codes[debuts[:, np.newaxis] + np.arange(self.n)]
+        grammes = grammes[np.all(grammes >= 0, axis=1)]
+        return grammes.dot(len(self.lettres) ** np.arange(self.n - 1, -1, -1))
+
+    def preparer(self, cache):
+        if self.creux and "colonnes" in cache:
+            # Composantes creuses : aucune colonne dense, seulement l'emplacement du bloc creux
+            reserver_colonnes(cache, self, 0)
+        else:
+            super(Freq_Ngrammes, self).preparer(cache)
+
+    def vecteurs(self, liste_textes, cache):
         for t in liste_textes:
-            X = t.texte_brut.lower()
-            X = [representant_canonique(x,self.langue) for x in X]
-            real_X = []
-            for k in range(0, len(X) - self.n, self.n):
-                real_X.append("".join(X[k:k + self.n]))
+            yield freqs_codes(self.codes_ngrammes(t), len(self.lettres) ** self.n)
+
+    def analyser(self, liste_textes, cache = None):
 
-            grammes = ["".join(l) for l in product([self.lettres]*self.n)]
-            v = freqs(real_X, grammes)
-            t.vecteur += v
+        if cache is None or not (self.creux and "colonnes" in cache):
+            return super(Freq_Ngrammes, self).analyser(liste_textes, cache)
+        indices = []
+        valeurs = []
+        debuts = [0]
+        for t in liste_textes:
+            codes, nombres = np.unique(self.codes_ngrammes(t), return_counts=True)
+            indices.append(codes)
+            valeurs.append(nombres / max(1, np.sum(nombres)))
+            debuts.append(debuts[-1] + len(codes))
+        M = sparse.csr_matrix((np.concatenate(valeurs + [np.zeros(0)]), np.concatenate(indices + [np.zeros(0, dtype=np.int64)]), debuts), shape=(len(liste_textes), len(self.lettres) ** self.n))
+        ajouter_bloc_creux(cache, self, M)
 
 class Markov_Lettres(FonctionAnalyse):
 
@@ -46,12 +78,18 @@ class Markov_Lettres(FonctionAnalyse):
                 composantes.append("Transitions {} -> {} ".format(i,j))
         super(Markov_Lettres,self).__init__(nom,composantes)
 
-    def analyser(self, liste_textes):
+    def cle(self):
+        return "Markov_Lettres-{}".format(self.langue)
+
+    # Les morceaux sont joints par une espace, qui n'est pas une lettre : aucune transition à ajouter aux jonctions
+    additive = True
+
+    def statistiques(self, liste_textes, cache):
 
         for t in liste_textes:
-            X = t.texte_brut.lower()
-            X = [representant_canonique(x, self.langue) for x in X]
+            yield comptes_sauts([1], codes_lettres(t.texte_brut.lower(), self.langue), len(self.lettres))[1].ravel()
 
-            v = markov(1,X,self.lettres)
-            t.vecteur += v
+    def composantes(self, comptes):
+        N = len(self.lettres)
+        return transitions_depuis_comptes(np.reshape(comptes, (N,N))).ravel()
 
@@ -18,13 +18,18 @@ class Freq_Ponct(FonctionAnalyse):
             composantes.append("Fréquence de {}".format(x))
         super(Freq_Ponct,self).__init__(nom,composantes)
 
-    def analyser(self, liste_textes):
+    def cle(self):
+        return "Freq_Ponct-{}".format(self.langue)
+
+    additive = True
+
+    def statistiques(self, liste_textes, cache):
 
         for t in liste_textes:
-            X = t.texte_brut.lower()
-            X = [representant_canonique(x,self.langue) for x in X]
-            v = freqs(t.texte_brut, self.signes)
-            t.vecteur += v
+            yield comptes_codes(encoder(t.texte_brut, self.signes), len(self.signes))
+
+    def composantes(self, comptes):
+        return frequences(comptes)
 
 class Longueur_Phrases(FonctionAnalyse):
 
@@ -36,9 +41,12 @@ class Longueur_Phrases(FonctionAnalyse):
 
         super(Longueur_Phrases, self).__init__("Longueur des phrases", composantes)
 
-    def analyser(self,liste_textes):
+    def cle(self):
+        return "Longueur_Phrases"
+
+    def vecteurs(self, liste_textes, cache):
         for t in liste_textes:
-            v =  log_serie_temporelle(np.array(t.racines), ".") + serie_temporelle(np.array(t.racines),".")
-            t.vecteur += v
+            X = t.codes("racines", ["."])
+            yield log_serie_temporelle(X, 0) + serie_temporelle(X, 0)
 
 
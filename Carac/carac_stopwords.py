@@ -22,8 +22,15 @@ class Freq_Stopwords(FonctionAnalyse):
             composantes.append("Fréquence de {}".format(x))
         super(Freq_Stopwords,self).__init__(nom,composantes)
 
-    def analyser(self, liste_textes):
+    def cle(self):
+        return "Freq_Stopwords-{}".format(self.langue)
+
+    additive = True
+
+    def statistiques(self, liste_textes, cache):
 
         for t in liste_textes:
-            v = freqs(t.racines, self.stopwords)
-            t.vecteur += v
+            yield comptes_codes(t.codes("racines", self.stopwords), len(self.stopwords))
+
+    def composantes(self, comptes):
+        return frequences(comptes)
@@ -1,4 +1,6 @@
 import numpy as np
+from scipy import sparse
+from Utilitaires.distances import matrice_distances, matrice_vecteurs
 from classes import Classifieur
 from Utilitaires.pca import pca
 import matplotlib.pyplot as plt
@@ -14,58 +16,124 @@ def mean(l):
     s = np.sum([t.vecteur for t in l], axis = 0)
     return s/N
 
-def centroids_init(l,k):
-    N = len(l)
-    
-    dis = np.zeros((N,N))
-    for i in range(N):
-        for j in range(N):
-            dis[i][j] = distance(l[i].vecteur,np.array(l[j].vecteur))
-    
-    S = []
-    U = list(range(N))
-            
-    i0 = np.argmin(np.sum(dis,axis  = 0))
-    S.append(i0)
-    U.remove(i0)
-    
+def ligne(X, i):
+    if sparse.issparse(X):
+        return X[i].toarray().ravel()
+    return np.array(X[i], dtype=float)
+
+def normes_carrees(X):
+    if sparse.issparse(X):
+        return np.asarray(X.multiply(X).sum(axis = 1)).ravel()
+    return np.einsum("ij,ij->i", X, X)
+
+def distances_carrees(X, C, normes_X = None):
+    """Matrice des carrés des distances entre les lignes de X et celles de C, calculée par ||x||² - 2 x.c + ||c||²."""
+    if normes_X is None:
+        normes_X = normes_carrees(X)
+    D = normes_X[:, None] - 2 * np.asarray(X.dot(np.transpose(C))) + np.einsum("ij,ij->i", C, C)[None, :]
+    return np.maximum(D, 0)
+
+def sommes_par_cluster(X, etiquettes, k):
+    """Sommes des lignes de X de chaque cluster, et nombre de lignes de chaque cluster."""
+    n = len(etiquettes)
+    M = sparse.csr_matrix((np.ones(n), (etiquettes, np.arange(n))), shape = (k, n))
+    S = M.dot(X)
+    if sparse.issparse(S):
+        S = S.toarray()
+    return np.asarray(S), np.bincount(etiquettes, minlength = k)
+
+def centres_gloutons(X, k):
+    """Initialisation gloutonne (phase build de PAM) : le premier centre est la ligne de X la plus centrale, chaque suivant est celle qui diminue le plus la somme des distances au centre le plus proche. Renvoie les indices des centres."""
+    N = X.shape[0]
+    dis = matrice_distances(X)
+    S = [int(np.argmin(np.sum(dis,axis  = 0)))]
+    U = np.ones(N, dtype=bool)
+    U[S[0]] = False
+    D = dis[:, S[0]].copy()
     while len(S) < k:
-        
-        D = np.zeros((len(U)))
-        for j in range(len(U)):
-            d = [dis[U[j]][i] for i in S]
-            D[j] = min(d)
-            
-        G = np.zeros((len(U)))
-        
-        for i in range(len(U)):
-            g = sum([ max(D[j] - dis[U[i]][U[j]],0) for j in range(len(U))])
-            G[i] = g
-            
-        i = U[np.argmax(G)]
+        indices_U = np.flatnonzero(U)
+        G = np.maximum(D[indices_U][None, :] - dis[np.ix_(indices_U, indices_U)], 0).sum(axis = 1)
+        i = int(indices_U[np.argmax(G)])
         S.append(i)
-        U.remove(i)
-    
-    return [np.array(l[s].vecteur) for s in S]
-
-def k_means(l,k):
-    """Cette fonction retourne une partion en k clusters de la liste de textes déterminé par l'algorithme des k_moyennes"""
+        U[i] = False
+        D = np.minimum(D, dis[:, i])
+    return S
 
-    new_centroids = centroids_init(l,k)
-    old_centroids = np.array([new_centroids[0]]* k)
-    
-    while distance(new_centroids,old_centroids) !=0:
-        
-        clusters = [[] for i in range(k)]
-        
-        for t in l:
-            i = np.array([distance(t.vecteur,new_centroids[j]) for j in range(k)]).argmin()
-            clusters[i].append(t)
-        
-        old_centroids = np.copy(new_centroids)
-        for i in range(k):
-            new_centroids[i] = mean(clusters[i])
-        
+def centroids_init(l,k):
+    X = matrice_vecteurs(l)
+    return [ligne(X, s) for s in centres_gloutons(X, k)]
+
+def centroides_kmeanspp(X, k, rs, normes_X = None):
+    """Initialisation k-means++ « gloutonne » : pour chaque nouveau centroïde, on tire 2 + log(k) candidats avec une probabilité proportionnelle au carré de leur distance au centroïde le plus proche, et on garde celui qui diminue le plus la somme de ces carrés."""
+    n = X.shape[0]
+    if normes_X is None:
+        normes_X = normes_carrees(X)
+    nb_essais = 2 + int(np.log(k))
+    C = [ligne(X, rs.integers(n))]
+    D = distances_carrees(X, np.array(C), normes_X)[:, 0]
+    while len(C) < k:
+        total = D.sum()
+        candidats = rs.choice(n, nb_essais, p = D / total) if total > 0 else rs.integers(n, size = nb_essais)
+        lignes = np.array([ligne(X, i) for i in candidats])
+        D_candidats = np.minimum(D[:, None], distances_carrees(X, lignes, normes_X))
+        meilleur = np.argmin(D_candidats.sum(axis = 0))
+        C.append(lignes[meilleur])
+        D = D_candidats[:, meilleur]
+    return np.array(C)
+
+def k_moyennes(X, k, graine = 0, init = "k-means++", tolerance = 1e-4, nb_iterations_max = 300, taille_lots = None, centroides = None):
+    """Algorithme des k-moyennes sur les lignes de la matrice X (dense ou creuse) ; renvoie le numéro de cluster de chaque ligne et les centroïdes.
+    - init = "k-means++" ou "glouton" (voir centroids_init), ignoré si des centroïdes de départ sont donnés
+    - on s'arrête quand la somme des carrés des déplacements des centroïdes passe sous tolerance fois la variance moyenne des composantes, ou après nb_iterations_max itérations
+    - si taille_lots est donné, on utilise la variante par mini-lots : chaque itération ne tire que taille_lots lignes, chaque centroïde se déplaçant vers ses points avec un pas qui décroît avec le nombre de points qu'il a reçus"""
+    n = X.shape[0]
+    k = min(k, n)
+    rs = np.random.default_rng(graine)
+    normes_X = normes_carrees(X)
+    if centroides is None:
+        if init == "glouton":
+            centroides = np.array([ligne(X, s) for s in centres_gloutons(X, k)])
+        else:
+            centroides = centroides_kmeanspp(X, k, rs, normes_X)
+    centroides = np.array(centroides, dtype=float)
+    variance = (normes_X.sum() / n - np.sum(np.asarray(X.mean(axis = 0)).ravel()**2)) / X.shape[1]
+    seuil = tolerance * variance
+    if taille_lots is None:
+        for iteration in range(nb_iterations_max):
+            etiquettes = distances_carrees(X, centroides, normes_X).argmin(axis = 1)
+            sommes, effectifs = sommes_par_cluster(X, etiquettes, k)
+            nouveaux = centroides.copy()
+            remplis = effectifs > 0
+            nouveaux[remplis] = sommes[remplis] / effectifs[remplis][:, None]
+            deplacement = np.sum((nouveaux - centroides)**2)
+            centroides = nouveaux
+            if deplacement <= seuil:
+                break
+    else:
+        comptes = np.zeros(k)
+        for iteration in range(nb_iterations_max):
+            lot = rs.choice(n, min(taille_lots, n), replace = False)
+            X_lot = X[lot]
+            etiquettes_lot = distances_carrees(X_lot, centroides, normes_X[lot]).argmin(axis = 1)
+            sommes, effectifs = sommes_par_cluster(X_lot, etiquettes_lot, k)
+            comptes += effectifs
+            remplis = effectifs > 0
+            pas = effectifs[remplis] / comptes[remplis]
+            nouveaux = centroides.copy()
+            nouveaux[remplis] = (1 - pas)[:, None] * centroides[remplis] + pas[:, None] * sommes[remplis] / effectifs[remplis][:, None]
+            deplacement = np.sum((nouveaux - centroides)**2)
+            centroides = nouveaux
+            if deplacement <= seuil:
+                break
+    etiquettes = distances_carrees(X, centroides, normes_X).argmin(axis = 1)
+    return etiquettes, centroides
+
+def k_means(l,k, **parametres):
+    """Cette fonction retourne une partion en k clusters de la liste de textes déterminé par l'algorithme des k_moyennes (voir k_moyennes pour les parametres)"""
+    etiquettes, centroides = k_moyennes(matrice_vecteurs(l), k, **parametres)
+    clusters = [[] for i in range(k)]
+    for t, i in zip(l, etiquettes):
+        clusters[i].append(t)
     return clusters
     
 markers_list = ["o", "s", "p", "*", "h", "H", "+", "x", "D", "d", "v", "^", "<", ">", "1", "2", "3", "4", "8"]
@@ -82,7 +150,7 @@ def clusters_plot(clusters):
     for c in clusters:
         for t in c:
             vecteurs.append(t.vecteur)
-    vecteurs = pca(vecteurs)
+    vecteurs = pca(vecteurs, 2)
     x = 0
     for i in range(k):
         A = []
@@ -99,9 +167,11 @@ def clusters_plot(clusters):
     
 class Kmeans(Classifieur):
     
-    def __init__(self):
+    def __init__(self, init = "k-means++", taille_lots = None, graine = 0):
         #print("Création du classifieur KMeans")
-        pass
+        self.init = init
+        self.taille_lots = taille_lots
+        self.graine = graine
     
     def classifier(self, training_set, eval_set, categories):
         self.liste_textes = training_set + eval_set
@@ -111,43 +181,5 @@ class Kmeans(Classifieur):
         self.categories = categories
         self.k = len(self.auteurs)
 
-        clusters = k_means(self.liste_textes,self.k)
-
-        self.clusters = [[]]*self.k
-
-        auteurs_clusters = ["?" for i in range(self.k)]
-        for j in range(self.k):
-            nb_oeuvres_par_auteur = {}
-            for auteur in self.auteurs:
-                nb_oeuvres_par_auteur[auteur] = 0
-            for t in clusters[j]:
-                if t in self.training_set:
-                    nb_oeuvres_par_auteur[t.categorie] +=1
-            auteur_max = "?"
-            nb_max = 0
-            for auteur in self.auteurs:
-                if nb_oeuvres_par_auteur[auteur] > nb_max :
-                    nb_max = nb_oeuvres_par_auteur[auteur]
-                    auteur_max = auteur
-            auteurs_clusters[j] = auteur_max
-
-        for i in range(self.k):
-            a = auteurs_clusters[i]
-            j = self.auteurs.index(a)
-            for t in clusters[i]:
-                if t in eval_set:
-                    self.clusters[j].append(t)
-
-        n = len(self.eval_set)
-
-        self.p = np.zeros((n,self.k))
-        self.p_ref = np.zeros((n,self.k))
-
-        for i in range(n):
-            t = eval_set[i]
-            self.p_ref[i, self.auteurs.index(t.categorie)] = 1
-            for j in range(self.k):
-                if t in self.clusters[j]:
-                    self.p[i, j] = 1
-
-
+        etiquettes, centroides = k_moyennes(matrice_vecteurs(self.liste_textes), self.k, graine = self.graine, init = self.init, taille_lots = self.taille_lots)
+        self.attribuer_clusters(etiquettes, distances_carrees(centroides, centroides))
@@ -1,4 +1,8 @@
 import numpy as np
+from scipy import sparse
+from scipy.spatial.distance import squareform
+from Utilitaires import distances
+from Utilitaires.distances import matrice_vecteurs
 from classes import Classifieur
 from Representation.fenetre import FenetreAffichage
 
@@ -6,85 +10,127 @@ def distance(x,y):
     return np.sum(np.abs(x-y))
 
 
-def build(l,k):
-    N = len(l)
-    
-    dis = np.zeros((N,N))
-    for i in range(N):
-        for j in range(N):
-            dis[i][j] = distance(l[i].vecteur,np.array(l[j].vecteur))
-    
-    S = []
-    U = list(range(N))
-            
-    i0 = np.argmin(np.sum(dis,axis  = 0))
-    S.append(i0)
-    U.remove(i0)
-    
+def matrice_distances(X):
+    """Matrice N×N des distances (somme des valeurs absolues des différences) entre les lignes de X."""
+    return distances.matrice_distances(X, "l1")
+
+def build_distances(dis,k):
+    """Phase build de PAM sur la matrice de distances dis : le premier médoïde est le point le plus central, chaque suivant est celui qui diminue le plus la somme des distances au médoïde le plus proche."""
+    N = len(dis)
+    S = [int(np.argmin(np.sum(dis,axis  = 0)))]
+    libres = np.ones(N, dtype=bool)
+    libres[S[0]] = False
+    D = dis[:, S[0]].copy()
     while len(S) < k:
-        
-        D = np.zeros((len(U)))
-        for j in range(len(U)):
-            d = [dis[U[j]][i] for i in S]
-            D[j] = min(d)
-            
-        G = np.zeros((len(U)))
-        
-        for i in range(len(U)):
-            g = sum([ max(D[j] - dis[U[i]][U[j]],0) for j in range(len(U))])
-            G[i] = g
-            
-        i = U[np.argmax(G)]
+        U = np.flatnonzero(libres)
+        G = np.maximum(D[U][None, :] - dis[np.ix_(U, U)], 0).sum(axis = 1)
+        i = int(U[np.argmax(G)])
         S.append(i)
-        U.remove(i)
-    
+        libres[i] = False
+        D = np.minimum(D, dis[:, i])
+    return S
+
+def build(l,k):
+    dis = matrice_distances(matrice_vecteurs(l))
+    S = build_distances(dis,k)
+    medoides = set(S)
+    U = [j for j in range(len(l)) if j not in medoides]
     return S,U,dis
-    
+
+def plus_proches(S,dis):
+    """Pour chaque point : numéro du médoïde le plus proche, distance à celui-ci et distance au deuxième plus proche."""
+    dis_S = dis[:, S]
+    if len(S) == 1:
+        return np.zeros(len(dis), dtype=int), dis_S[:, 0], np.full(len(dis), np.inf)
+    ordre = np.argpartition(dis_S, 1, axis = 1)[:, :2]
+    proches = ordre[:, 0]
+    D = np.take_along_axis(dis_S, ordre[:, :1], axis = 1)[:, 0]
+    E = np.take_along_axis(dis_S, ordre[:, 1:], axis = 1)[:, 0]
+    echange = E < D
+    proches[echange] = ordre[echange, 1]
+    D, E = np.minimum(D, E), np.maximum(D, E)
+    return proches, D, E
+
 def swap(S,U,dis):
-    T = np.zeros((len(S),len(U)))
-    D = np.zeros((len(U)))
-    E = np.zeros((len(U)))
-    while T.min() <= 0:
-        
-        for j in range(len(U)):
-            d = [dis[U[j]][i] for i in S]
-            D[j] = min(d)
-            d.remove(D[j])
-            E[j] = min(d)
-        
-        for i in range(len(S)):
-            for h in range(len(U)):
-                K = 0
-                for j in range(len(U)):
-                    if j!=h:
-                        if dis[S[i]][U[j]] > D[j]:
-                            K += min(dis[U[j]][U[h]] - D[j], 0)
-                        else:
-                            K += min(dis[U[j]][U[h]],E[j]) - D[j]
-                T[i][h] = K
-                
+    """Phase swap de PAM à la manière de FastPAM1 : pour chaque candidat h, la variation du coût total quand h remplace le médoïde i est calculée pour tous les i à la fois, avec un terme commun à tous les médoïdes et une correction sommée sur les points du cluster de i.
+    Chaque itération coûte O(N²) au lieu de O(k.N²). On effectue le meilleur échange tant qu'il diminue le coût ; S et U sont modifiés sur place."""
+    N = len(dis)
+    while len(U) > 0:
+        proches, D, E = plus_proches(S,dis)
+        dis_U = dis[:, U]
+        commun = np.minimum(dis_U - D[:, None], 0)
+        correction = np.minimum(dis_U, E[:, None]) - D[:, None] - commun
+        indicatrice = sparse.csr_matrix((np.ones(N), (proches, np.arange(N))), shape = (len(S), N))
+        T = commun.sum(axis = 0)[None, :] + indicatrice.dot(correction)
         (i,h) = np.unravel_index(T.argmin(), T.shape)
-        if T[i][h]<0:
-            xi = S[i]
-            xh = U[h]
-            S.append(xh)
-            S.remove(xi)
-            U.append(xi)
-            U.remove(xh)
-        
+        if T[i][h] >= -1e-12 * max(D.sum(), 1):
+            break
+        xi = S[i]
+        xh = U[h]
+        S[i] = xh
+        U[h] = xi
+
+def cout(S,dis):
+    return dis[:, S].min(axis = 1).sum()
+
+def pam(X,k):
+    """Renvoie les indices des médoïdes des lignes de X trouvés par PAM (build puis swap). La matrice des distances n'est pas mise en cache : pam sert surtout aux échantillons de clara."""
+    dis = squareform(distances.distances_condensees(X, "l1"))
+    S = build_distances(dis,k)
+    libres = np.ones(len(dis), dtype=bool)
+    libres[S] = False
+    U = list(np.flatnonzero(libres))
+    swap(S,U,dis)
+    return S
+
+def clara(X,k,nb_echantillons = 5,taille_echantillon = None,graine = 0):
+    """CLARA : PAM est appliqué à nb_echantillons échantillons aléatoires de taille_echantillon lignes de X (par défaut 40 + 2k), et on garde les médoïdes de coût total le plus faible sur toutes les lignes.
+    La mémoire utilisée est en O(taille_echantillon² + N.k) au lieu de O(N²). Renvoie les indices des médoïdes et le numéro du médoïde le plus proche de chaque ligne."""
+    N = X.shape[0]
+    if taille_echantillon is None:
+        taille_echantillon = 40 + 2 * k
+    taille_echantillon = min(taille_echantillon, N)
+    rs = np.random.default_rng(graine)
+    if sparse.issparse(X):
+        # Seules les lignes de chaque échantillon sont densifiées, puis distances_entre densifie X bloc par bloc
+        X = X.tocsr()
+    meilleurs = None
+    for e in range(nb_echantillons):
+        echantillon = rs.choice(N, taille_echantillon, replace = False)
+        if meilleurs is not None:
+            # Les meilleurs médoïdes trouvés jusque-là font partie de chaque nouvel échantillon
+            echantillon = np.concatenate([meilleurs, echantillon[~np.isin(echantillon, meilleurs)][:taille_echantillon - k]])
+        S = echantillon[pam(X[echantillon],k)]
+        dis = distances.distances_entre(X, X[S], "l1")
+        c = dis.min(axis = 1).sum()
+        if meilleurs is None or c < meilleur_cout:
+            meilleurs, meilleur_cout, etiquettes = S, c, dis.argmin(axis = 1)
+    etiquettes[meilleurs] = np.arange(k)
+    return list(meilleurs), etiquettes
+
 def clusterize(l,S,U,dis):
-    
-    c = [ [l[s]] for s in S]
-    for j in range(len(U)):
-        i = np.argmin([dis[U[j]][i] for i in S])
-        c[i].append(l[U[j]])
+    etiquettes = etiquettes_medoides(S,dis)
+    c = [[] for s in S]
+    for t, i in zip(l, etiquettes):
+        c[i].append(t)
     return c
 
+def etiquettes_medoides(S,dis):
+    """Numéro du médoïde le plus proche de chaque point (chaque médoïde étant dans son propre cluster)."""
+    etiquettes = np.argmin(dis[:, S], axis = 1)
+    etiquettes[S] = np.arange(len(S))
+    return etiquettes
+
 class KMedoids(Classifieur):
+    """methode = "pam", "clara" ou "auto" : PAM jusqu'à taille_max_pam textes (la matrice des distances est en N²), CLARA au-delà."""
     
-    def __init__(self):
+    def __init__(self, methode = "auto", taille_max_pam = 3000, nb_echantillons = 5, taille_echantillon = None, graine = 0):
         #print("Création du classifieur KMedoids")
-        pass
+        self.methode = methode
+        self.taille_max_pam = taille_max_pam
+        self.nb_echantillons = nb_echantillons
+        self.taille_echantillon = taille_echantillon
+        self.graine = graine
     
     def classifier(self, training_set, eval_set, categories):
         self.liste_textes = training_set + eval_set
@@ -93,43 +139,11 @@ class KMedoids(Classifieur):
         self.auteurs = categories
         self.categories = categories
         self.k = len(self.auteurs)
-        S,U,dis = build(self.liste_textes,self.k)
-        swap(S,U,dis)
-        clusters = clusterize(self.liste_textes,S,U,dis)
-
-        self.clusters = [[]]*self.k
-
-        auteurs_clusters = ["?" for i in range(self.k)]
-        for j in range(self.k):
-            nb_oeuvres_par_auteur = {}
-            for auteur in self.auteurs:
-                nb_oeuvres_par_auteur[auteur] = 0
-            for t in clusters[j]:
-                if t in self.training_set:
-                    nb_oeuvres_par_auteur[t.categorie] +=1
-            auteur_max = "?"
-            nb_max = 0
-            for auteur in self.auteurs:
-                if nb_oeuvres_par_auteur[auteur] > nb_max :
-                    nb_max = nb_oeuvres_par_auteur[auteur]
-                    auteur_max = auteur
-            auteurs_clusters[j] = auteur_max
-
-        for i in range(self.k):
-            a = auteurs_clusters[i]
-            j = self.auteurs.index(a)
-            for t in clusters[i]:
-                if t in eval_set:
-                    self.clusters[j].append(t)
-
-        n = len(self.eval_set)
-
-        self.p = np.zeros((n, self.k))
-        self.p_ref = np.zeros((n, self.k))
-
-        for i in range(n):
-            t = eval_set[i]
-            self.p_ref[i, self.auteurs.index(t.categorie)] = 1
-            for j in range(self.k):
-                if t in self.clusters[j]:
-                    self.p[i, j] = 1
\ No newline at end of file
+        if self.methode == "clara" or (self.methode == "auto" and len(self.liste_textes) > self.taille_max_pam):
+            S, etiquettes = clara(matrice_vecteurs(self.liste_textes), self.k, self.nb_echantillons, self.taille_echantillon, self.graine)
+        else:
+            S,U,dis = build(self.liste_textes,self.k)
+            swap(S,U,dis)
+            etiquettes = etiquettes_medoides(S,dis)
+        self.medoides = [self.liste_textes[s] for s in S]
+        self.attribuer_clusters(etiquettes, distances.distances_entre(matrice_vecteurs(self.medoides), matrice_vecteurs(self.medoides), "l1"))
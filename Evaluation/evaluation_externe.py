@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 import numpy as np
+from Evaluation import evaluation_relative as er
+from Utilitaires.distances import distances_textes
 
 def distance(texte1, texte2):
     """ Distance entre les textes passés en arguments """
@@ -8,24 +10,19 @@ def distance(texte1, texte2):
 
 def distance_clusters_SL(textes,p,i,j):
     """ Distance single-linkage entre les clusters i et j """
-    m=float("inf")
-    for k in np.where(p[:,i] ==1)[0]:
-        for l in np.where(p[:,j] ==1)[0]:
-            m = min(m,distance(textes[k],textes[l]))
-    return m
+    return er.distance_clusters_SL(textes,p,i,j)
 
 def huberts_externe(textes,p,p_ref):
     """ Statistique de Huberts externe pour la partition p avec la partition p_ref en référence"""
     N = len(textes)
     M = N*(N-1)/1
 
-    num_clusters = [np.where(p[i] ==1)[0][0] for i in range(N)]
-    num_clusters_ref = [np.where(p_ref[i] ==1)[0][0] for i in range(N)]
-    
-    gamma = 0
-    for i in range(N):
-        for j in range(i+1,N):
-            gamma += distance_clusters_SL(textes,p,num_clusters[i],num_clusters[j]) * distance_clusters_SL(textes,p_ref,num_clusters_ref[i],num_clusters_ref[j])
+    num_clusters = np.argmax(p == 1, axis = 1)
+    num_clusters_ref = np.argmax(p_ref == 1, axis = 1)
+    dis = distances_textes(textes)
+    SL = er.matrice_SL(dis, p)[np.ix_(num_clusters, num_clusters)]
+    SL_ref = er.matrice_SL(dis, p_ref)[np.ix_(num_clusters_ref, num_clusters_ref)]
+    gamma = np.sum(np.triu(SL * SL_ref, 1))
     return gamma/M
 
 def calcul_taux(textes,p,p_ref):
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import numpy as np
+from Utilitaires.distances import distances_textes
 
 
 
@@ -13,10 +14,7 @@ def huberts_interne(textes,p):
     """ Statistique de Huberts interne pour la partition p"""
     N = len(textes)
     M = N*(N-1)/1
-    num_clusters = [np.where(p[i] ==1)[0][0] for i in range(N)]
-    
-    gamma = 0
-    for i in range(N):
-        for j in range(i+1,N):
-            gamma += distance(textes[i],textes[j]) * (1-int(num_clusters[i] == num_clusters[j]))
+    num_clusters = np.argmax(p == 1, axis = 1)
+    dis = distances_textes(textes)
+    gamma = np.sum(np.triu(dis * (num_clusters[:, None] != num_clusters[None, :]), 1))
     return gamma/M
\ No newline at end of file
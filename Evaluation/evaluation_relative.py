@@ -1,48 +1,54 @@
 # -*- coding: utf-8 -*-
 import numpy as np
+from Utilitaires.distances import distances_textes
 
 def distance(texte1, texte2):
     """ Distance entre les textes passés en arguments """
     
     return np.linalg.norm(texte1.vecteur - np.array(texte2.vecteur))
 
+def SL(dis, idx_i, idx_j):
+    """ Distance single-linkage entre les ensembles de textes d'indices idx_i et idx_j, dis étant la matrice des distances """
+    if len(idx_i) == 0 or len(idx_j) == 0:
+        return float("inf")
+    return dis[np.ix_(idx_i, idx_j)].min()
+
+def indices_clusters(p):
+    return [np.where(p[:,i] ==1)[0] for i in range(len(p[0]))]
+
+def matrice_SL(dis, p):
+    """ Matrice des distances single-linkage entre les clusters de la partition p """
+    idx = indices_clusters(p)
+    return np.array([[SL(dis, idx[i], idx[j]) for j in range(len(idx))] for i in range(len(idx))])
+
 def distance_clusters_SL(textes,p,i,j):
     """ Distance single-linkage entre les clusters i et j """
-    m=float("inf")
-    for k in np.where(p[:,i] ==1)[0]:
-        for l in np.where(p[:,j] ==1)[0]:
-            m = min(m,distance(textes[k],textes[l]))
-    return m
+    return SL(distances_textes(textes), np.where(p[:,i] ==1)[0], np.where(p[:,j] ==1)[0])
 
 
 def huberts_relatif(textes,p):
     """ Statistique de Huberts relative pour la partition p"""
     N = len(textes)
     M = N*(N-1)/1
-
-    num_clusters = [np.where(p[i] ==1)[0][0] for i in range(N)]
-   
-    gamma = 0
-    for i in range(N):
-        for j in range(i+1,N):
-            gamma += distance(textes[i],textes[j]) * distance_clusters_SL(textes,p,num_clusters[i],num_clusters[j])
+    num_clusters = np.argmax(p == 1, axis = 1)
+    dis = distances_textes(textes)
+    SL_clusters = matrice_SL(dis, p)
+    gamma = np.sum(np.triu(dis * SL_clusters[np.ix_(num_clusters, num_clusters)], 1))
     return gamma/M
- 
+
+def diametre(dis, idx):
+    if len(idx) == 0:
+        return 0
+    return dis[np.ix_(idx, idx)].max()
+
 def diametre_cluster(textes,p,i):
-    m=0
-    for k in np.where(p[:,i] ==1)[0]:
-        for l in np.where(p[:,i] ==1)[0]:
-            m = max(m, distance(textes[k],textes[l]))
-    return m
+    return diametre(distances_textes(textes), np.where(p[:,i] ==1)[0])
     
 def dunn(textes,p):
     k = len(p[0])
-    dis = np.zeros((k,k))
-    diam = np.zeros((k))
-    for i in range(k):
-        diam[i] = diametre_cluster(textes,p,i)
-        for j in range(k):
-            dis[i][j] = distance_clusters_SL(textes,p,i,j)
+    dis_textes = distances_textes(textes)
+    dis = matrice_SL(dis_textes, p)
+    diam = np.array([diametre(dis_textes, idx) for idx in indices_clusters(p)])
     
     M = float("inf")
     for i in range(k):
@@ -56,7 +56,7 @@ class FenetreAffichage:
         for texte in self.liste_textes:
             vecteurs.append(texte.vecteur)
             self.vecteurs_originaux.append(texte.vecteur)
-        vecteurs, self.matrice_proportions = pca_matrice(vecteurs)
+        vecteurs, self.matrice_proportions = pca_matrice(vecteurs, 2)
 
         # Création des variables du système de réévaluation des composantes
 
@@ -175,7 +175,7 @@ class FenetreAffichage:
         indice = i
         """dilatation[indice][indice] = float(arg)/max(float(self.coefficients_coordonnees[indice]), 0.1)
         self.matrice_proportions = np.dot(self.matrice_proportions, dilatation)"""
-        for k in range(self.dimension):
+        for k in range(len(self.matrice_proportions)):
             self.matrice_proportions[k][indice] *= float(arg) / max(float(self.coefficients_coordonnees[indice]), 0.1)
         self.coefficients_coordonnees[indice] = arg
 
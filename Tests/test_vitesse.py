@@ -0,0 +1,470 @@
+from time import time, sleep
+import os
+import sys
+sys.path.append("/Users/Guillaume/Documents/Informatique/psc")
+from classes import *
+from bdd import ChargerTable
+import numpy as np
+import matplotlib.pyplot as plt
+
+## Découpage des oeuvres
+
+oeuvre_decoupage = ("balzac", 1)
+tailles_decoupage = [10000, 5000, 2000, 1000, 500, 200, 100]
+
+def test_decoupage():
+    oeuvre = Oeuvre(oeuvre_decoupage[0], oeuvre_decoupage[1], "fr", ChargerTable())
+    nb_morceaux = []
+    temps = []
+    for taille_morceaux in tailles_decoupage:
+        d = time()
+        textes = oeuvre.split(taille_morceaux)
+        f = time()
+        nb_morceaux.append(len(textes))
+        temps.append(f - d)
+        print("{} morceaux de {} mots : {:.4f}s".format(len(textes), taille_morceaux, f - d))
+    plt.close()
+    plt.plot(nb_morceaux, temps, marker="o")
+    plt.xlabel("Nombre de morceaux")
+    plt.ylabel("Temps de Oeuvre.split (s)")
+    plt.title("Découpage de " + oeuvre_decoupage[0] + str(oeuvre_decoupage[1]))
+    plt.savefig("vitesse_decoupage.png")
+
+## Chargement des oeuvres
+
+id_oeuvres_chargement = [("balzac",k) for k in range(1,4)] + [("stendhal",k) for k in range(1,3)] + [("flaubert",k) for k in [1,3,4]]
+
+def test_chargement():
+    table_infos = ChargerTable()
+    d = time()
+    oeuvres = [Oeuvre(auteur, numero, "fr", table_infos) for (auteur, numero) in id_oeuvres_chargement]
+    f = time()
+    print()
+    print("Ouverture de {} oeuvres : {:.4f}s".format(len(oeuvres), f - d))
+    d = time()
+    nb_mots = sum(len(o.flux("POS")) for o in oeuvres)
+    f = time()
+    print("Projection des flux POS ({} mots) : {:.4f}s".format(nb_mots, f - d))
+    d = time()
+    for o in oeuvres:
+        o.POS
+    f = time()
+    print("Décodage des flux POS : {:.4f}s".format(f - d))
+
+def test_conversion(emplacement = "stock_conversion/"):
+    """Vérifie qu'une oeuvre picklée dans l'ancien format (sans stock) se relit et se convertit en StockOeuvre comme dans Oeuvre.__init__."""
+    os.makedirs(emplacement, exist_ok = True)
+    ancienne = Oeuvre.__new__(Oeuvre)
+    ancienne.__dict__.update({"auteur": "auteur", "numero": 1, "langue": "fr", "categorie": None, "texte_brut": "Le chat dort .",
+                              "mots": ["Le", "chat", "dort", "."], "racines": ["le", "chat", "dormir", "."], "POS": ["DET:ART", "NOM", "VER:pres", "SENT"]})
+    o = pickle.loads(pickle.dumps(ancienne, protocol = 2)).__dict__
+    stock = StockOeuvre(emplacement, "auteur1")
+    stock.ecrire(o["texte_brut"], o["mots"], o["racines"], o["POS"], vocabulaire(emplacement))
+    voc = vocabulaire(emplacement)
+    print("Conversion correcte : {}".format(all(voc.decoder(stock.lire(champ)) == o[champ] for champ in ["mots", "racines", "POS"]) and stock.lire_texte() == o["texte_brut"]))
+
+## Etiquetage
+
+from Utilitaires.etiquetage import ServiceEtiquetage, etiqueter, creer_tagger
+
+class TaggerBidon:
+    """Remplace TreeTagger pour mesurer le coût de l'étiquetage sans le tagger : la création simule le lancement du processus et le chargement du fichier de paramètres."""
+    def __init__(self, langue):
+        sleep(0.5)
+        self.langue = langue
+
+    def tag_text(self, texte):
+        return ["{}\t{}\t{}".format(m, "SENT" if m == "." else "NOM", m.lower()) for m in texte.split()]
+
+def creer_tagger_bidon(langue):
+    return TaggerBidon(langue)
+
+def documents_etiquetage(N, taille = 200):
+    mots = ["Le", "chat", "mange", "la", "souris", ",", "puis", "dort", "."]
+    return [" ".join(mots[(k + i) % len(mots)] for i in range(taille)) for k in range(N)]
+
+def test_etiquetage(N = 50, bidon = True):
+    """Compare l'étiquetage de N petits documents par le chemin de Oeuvre.__init__ (un nouveau tagger par document) et par le ServiceEtiquetage."""
+    createur = creer_tagger_bidon if bidon else creer_tagger
+    documents = documents_etiquetage(N)
+    d = time()
+    resultats1 = [etiqueter(createur("fr"), texte) for texte in documents]
+    f = time()
+    print("Un tagger par document : {:.3f}s".format(f - d))
+    service = ServiceEtiquetage(os.cpu_count(), createur_tagger = createur)
+    d = time()
+    resultats2 = service.etiqueter(documents, "fr")
+    f = time()
+    print("Service d'étiquetage, premier lot : {:.3f}s".format(f - d))
+    d = time()
+    resultats2 = service.etiqueter(documents, "fr")
+    f = time()
+    print("Service d'étiquetage, lot suivant : {:.3f}s".format(f - d))
+    service.fermer()
+    print("Résultats identiques : {}".format(resultats1 == resultats2))
+
+## Fréquences et transitions
+
+from Utilitaires.stats import freqs, markov, encoder, freqs_codes, markov_codes
+from Carac.carac_gramm import Freq_Gram
+
+def freqs_boucle(X,items):
+    """Ancienne version de stats.freqs, gardée pour comparaison."""
+    res = np.zeros((len(items)))
+    for x in X:
+        if x in items:
+            res[items.index(x)]+=1
+    S = np.sum(res)
+    if (S>0):
+        res = res / np.sum(res)
+    return list(res)
+
+def markov_boucle(saut,X,states):
+    """Ancienne version de stats.markov, gardée pour comparaison."""
+    Nij = np.zeros((len(states),len(states)))
+    N = np.zeros((len(states)))
+    res = []
+    for i in range(len(X)-saut):
+        if (X[i] in states and  X[i+saut] in states):
+            Nij[states.index(X[i]),states.index(X[i+saut])] +=1
+            N[states.index(X[i])]+=1
+    for i in range(len(states)):
+        if (N[i]>0):
+            Nij[i, :] /= N[i]
+    for i in range(len(states)):
+        for j in range(len(states)):
+            res.append(Nij[i,j])
+    return res
+
+tailles_stats = [1000, 5000, 10000, 50000, 100000]
+
+def test_stats(langues = ["fr", "en", "zh"], saut = 1):
+    """Compare, pour chaque jeu d'étiquettes et chaque taille de morceau, les anciennes boucles de freqs et markov avec le moteur vectoriel : sur les strings (encodage compris) et sur des codes déjà calculés."""
+    for langue in langues:
+        natures = Freq_Gram(langue).natures
+        etiquettes = natures + ["INCONNU"]
+        for taille in tailles_stats:
+            X = [etiquettes[i] for i in np.random.randint(len(etiquettes), size=taille)]
+            d = time()
+            f1, m1 = freqs_boucle(X, natures), markov_boucle(saut, X, natures)
+            t1 = time() - d
+            d = time()
+            f2, m2 = freqs(X, natures), markov(saut, X, natures)
+            t2 = time() - d
+            codes = encoder(X, natures)
+            d = time()
+            freqs_codes(codes, len(natures)), markov_codes(saut, codes, len(natures))
+            t3 = time() - d
+            print("{} ({} étiquettes), {} mots : boucles {:.4f}s, vectoriel {:.4f}s, codes {:.4f}s, identiques : {}".format(langue, len(natures), taille, t1, t2, t3, f1 == f2 and m1 == m2))
+
+## Agrégation de morceaux
+
+from Carac.carac_gramm import Markov_Gram
+from Carac.carac_ponct import Freq_Ponct
+from Carac.carac_lettres import Markov_Lettres
+
+id_oeuvres_agregation = id_oeuvres_chargement
+taille_base = 1000
+tailles_agregation = [2000, 5000, 10000]
+
+def analyseur_agregation():
+    return Analyseur("Additif", [Freq_Gram("fr"), Markov_Gram("fr", 1, False), Markov_Gram("fr", 2, False), Freq_Ponct("fr"), Markov_Lettres("fr")])
+
+def test_agregation(emplacement_stock = "stock_agregation/"):
+    """Compare, pour plusieurs tailles de morceaux, l'extraction directe et l'agrégation des statistiques de morceaux de taille_base stockées une fois pour toutes."""
+    table_infos = ChargerTable()
+    oeuvres = [Oeuvre(auteur, numero, "fr", table_infos) for (auteur, numero) in id_oeuvres_agregation]
+    stock = StockCaracteristiques(emplacement_stock)
+    d = time()
+    stocker_morceaux(analyseur_agregation(), oeuvres, taille_base, stock, 1)
+    f = time()
+    print()
+    print("Extraction des morceaux de {} mots : {:.3f}s".format(taille_base, f - d))
+    for taille in tailles_agregation:
+        textes = [t for o in oeuvres for t in o.split(taille)]
+        d = time()
+        D1 = analyseur_agregation().vectoriser(textes, 1)
+        f = time()
+        t1 = f - d
+        textes = [t for o in oeuvres for t in o.split(taille)]
+        d = time()
+        D2 = analyseur_agregation().vectoriser(textes, 1, stock)
+        f = time()
+        print("{} morceaux de {} mots : extraction {:.3f}s, agrégation {:.3f}s, identiques : {}".format(len(textes), taille, t1, f - d, np.array_equal(D1, D2)))
+
+## Normalisation
+
+from Utilitaires.equilibrage_et_normalisation import Normaliseur
+
+def normaliser_boucle(D):
+    """Ancienne version de normaliser1, gardée pour comparaison."""
+    M = D.mean(axis = 0)
+    V = D.var(axis = 0)
+    A = np.zeros(D.shape)
+    for i in range(D.shape[0]):
+        for j in range(D.shape[1]):
+            if V[j] != 0:
+                A[i][j] = (D[i][j] - M[j])/np.sqrt(V[j])
+    A[np.isnan(A)] = 0
+    return A
+
+def test_normalisation(tailles = [(200, 100), (1000, 500), (2000, 2000)], taille_lots = 100):
+    """Compare l'ancienne normalisation par boucles, Normaliseur.fit_transform et l'apprentissage par lots avec partial_fit."""
+    for (n, d) in tailles:
+        D = np.random.rand(n, d)
+        t = time()
+        A1 = normaliser_boucle(D)
+        t1 = time() - t
+        t = time()
+        A2 = Normaliseur().fit_transform(D)
+        t2 = time() - t
+        normaliseur = Normaliseur()
+        t = time()
+        for k in range(0, n, taille_lots):
+            normaliseur.partial_fit(D[k:k + taille_lots])
+        t3 = time() - t
+        print("{} textes, {} composantes : boucles {:.4f}s, vectoriel {:.4f}s, par lots {:.4f}s, identiques : {}, écart par lots : {:.1e}".format(n, d, t1, t2, t3, np.array_equal(A1, A2), np.abs(normaliseur.transform(D) - A2).max()))
+
+## Equilibrage
+
+from Utilitaires.equilibrage_et_normalisation import indices_equilibres
+
+def random_sample_boucle(seed,l,n):
+    """Ancienne version de random_sample, gardée pour comparaison."""
+    rs = seed
+    l2 = []
+    ind = []
+    while len(l2)<n:
+        x = rs % len(l)
+        if x not in ind:
+            l2.append(l[x])
+            ind.append(x)
+        rs = (1103515245 * rs + 12345) % (2**16)
+    return l2
+
+def test_equilibrage(tailles = [100, 1000, 5000, 20000], graine = 12345):
+    """Compare l'ancien tirage par catégorie et indices_equilibres, pour deux catégories de tailles n et 2n."""
+    for n in tailles:
+        categories = ["a"] * n + ["b"] * (2 * n)
+        groupes = [list(range(n)), list(range(n, 3 * n))]
+        d = time()
+        for g in groupes:
+            random_sample_boucle(graine, g, n)
+        t1 = time() - d
+        d = time()
+        indices = indices_equilibres(categories, graine)
+        t2 = time() - d
+        print("{} textes : ancien tirage {:.4f}s, indices_equilibres {:.4f}s ({} textes gardés)".format(3 * n, t1, t2, len(indices)))
+
+## Analyse en composantes principales
+
+from Utilitaires.pca import PCA
+
+def pca_covariance(X):
+    """Ancien calcul de Utilitaires.pca : matrice de covariance p×p complète et SVD, gardé pour comparaison."""
+    Xc = X - X.mean(axis = 0)
+    U, s, Vt = np.linalg.svd(np.cov(np.transpose(Xc)))
+    return np.dot(Xc, U)
+
+def test_pca(n = 300, tailles = [500, 2000, 5000], nb_composantes = 20):
+    """Compare, pour n textes et p composantes, l'ancien calcul et les méthodes de PCA : Gram, SVD aléatoire tronquée et PCA incrémentale par lots de 50 textes."""
+    for p in tailles:
+        X = np.dot(np.random.randn(n, 50), np.random.randn(50, p)) + 0.1 * np.random.randn(n, p)
+        d = time()
+        pca_covariance(X)
+        t0 = time() - d
+        temps = []
+        for methode in ["gram", "aleatoire"]:
+            d = time()
+            PCA(nb_composantes, methode).fit_transform(X)
+            temps.append(time() - d)
+        incrementale = PCA(nb_composantes)
+        d = time()
+        for k in range(0, n, 50):
+            incrementale.partial_fit(X[k:k + 50])
+        temps.append(time() - d)
+        print("{} textes, {} composantes : covariance {:.3f}s, gram {:.3f}s, aléatoire {:.3f}s, incrémentale {:.3f}s".format(n, p, t0, *temps))
+
+## K-moyennes
+
+from Clustering.kmeans import k_moyennes
+
+class TexteBidon:
+    def __init__(self, vecteur):
+        self.vecteur = vecteur
+
+def k_means_boucle(l,k):
+    """Ancienne version de Clustering.kmeans.k_means (initialisation gloutonne comprise), gardée pour comparaison."""
+    N = len(l)
+    dis = np.zeros((N,N))
+    for i in range(N):
+        for j in range(N):
+            dis[i][j] = np.linalg.norm(l[j].vecteur - l[i].vecteur)
+    S = []
+    U = list(range(N))
+    i0 = np.argmin(np.sum(dis,axis  = 0))
+    S.append(i0)
+    U.remove(i0)
+    while len(S) < k:
+        D = np.zeros((len(U)))
+        for j in range(len(U)):
+            D[j] = min([dis[U[j]][i] for i in S])
+        G = np.zeros((len(U)))
+        for i in range(len(U)):
+            G[i] = sum([ max(D[j] - dis[U[i]][U[j]],0) for j in range(len(U))])
+        i = U[np.argmax(G)]
+        S.append(i)
+        U.remove(i)
+    new_centroids = [np.array(l[s].vecteur) for s in S]
+    old_centroids = np.array([new_centroids[0]]* k)
+    while np.linalg.norm(np.array(new_centroids) - old_centroids) != 0:
+        clusters = [[] for i in range(k)]
+        for t in l:
+            i = np.array([np.linalg.norm(t.vecteur - new_centroids[j]) for j in range(k)]).argmin()
+            clusters[i].append(t)
+        old_centroids = np.copy(new_centroids)
+        for i in range(k):
+            new_centroids[i] = np.sum([t.vecteur for t in clusters[i]], axis = 0) / len(clusters[i])
+    return clusters
+
+def donnees_kmeans(N, k = 5, p = 50):
+    centres = 5 * np.random.randn(k, p)
+    return centres[np.random.randint(k, size=N)] + np.random.randn(N, p)
+
+def test_kmeans(tailles = [100, 200, 500, 1000, 10000, 50000], k = 5, taille_max_boucle = 500):
+    """Temps de l'ancien k_means (jusqu'à taille_max_boucle textes), de k_moyennes avec initialisation k-means++ et de sa variante par mini-lots, en fonction du nombre de textes N."""
+    temps = {"boucles": [], "vectoriel": [], "mini-lots": []}
+    for N in tailles:
+        X = donnees_kmeans(N, k)
+        if N <= taille_max_boucle:
+            d = time()
+            k_means_boucle([TexteBidon(x) for x in X], k)
+            temps["boucles"].append(time() - d)
+        d = time()
+        k_moyennes(X, k)
+        temps["vectoriel"].append(time() - d)
+        d = time()
+        k_moyennes(X, k, taille_lots = 1000)
+        temps["mini-lots"].append(time() - d)
+        noms = [nom for nom in temps if nom != "boucles" or N <= taille_max_boucle]
+        print("N = {} : ".format(N) + ", ".join("{} {:.4f}s".format(nom, temps[nom][-1]) for nom in noms))
+    plt.close()
+    for nom, t in temps.items():
+        plt.loglog(tailles[:len(t)], t, marker="o", label=nom)
+    plt.xlabel("Nombre de textes N")
+    plt.ylabel("Temps (s)")
+    plt.legend(loc="best")
+    plt.savefig("vitesse_kmeans.png")
+
+## K-médoïdes
+
+from Clustering.kmedoids import pam, clara, matrice_distances, cout
+
+def test_kmedoides(tailles = [200, 500, 1000, 2000, 20000], k = 5, taille_max_pam = 2000):
+    """Temps et coût total de PAM (jusqu'à taille_max_pam textes) et de CLARA en fonction du nombre de textes N."""
+    for N in tailles:
+        X = donnees_kmeans(N, k)
+        d = time()
+        S, etiquettes = clara(X, k)
+        t2 = time() - d
+        c2 = np.sum(np.abs(X - X[S][etiquettes]))
+        if N <= taille_max_pam:
+            d = time()
+            S = pam(X, k)
+            t1 = time() - d
+            print("N = {} : PAM {:.3f}s (coût {:.1f}), CLARA {:.3f}s (coût {:.1f})".format(N, t1, cout(S, matrice_distances(X)), t2, c2))
+        else:
+            print("N = {} : CLARA {:.3f}s (coût {:.1f})".format(N, t2, c2))
+
+## Bayes
+
+from math import sqrt, pi, e
+from Apprentissage.Bayes import Bayes, f, g
+
+def f_boucle(vecteur_training, categorie_training, categories):
+    """Ancienne version de Bayes.f, gardée pour comparaison."""
+    n = len(categories)
+    m = len(vecteur_training[0])
+    Classes = [[] for i in range(n)]
+    for j in range(len(vecteur_training)):
+        Classes[categories.index(categorie_training[j])].append(np.asarray(vecteur_training[j]))
+    moyenne = np.zeros((n,m))
+    ecart_type = np.zeros((n,m))
+    for i in range(n):
+       moyenne[i] = np.mean(Classes[i], 0)
+       ecart_type[i] = np.sqrt(np.var(Classes[i], 0))
+    return moyenne, ecart_type
+
+def g_boucle(moyenne, ecart_type, inconnus):
+    """Ancienne version de Bayes.g, gardée pour comparaison."""
+    m = len(inconnus)
+    n = moyenne.shape[1]
+    k = moyenne.shape[0]
+    Probabilite  = np.ones((m,k))
+    for i in range (m):
+        for l in range(k):
+            for j in range(n):
+                if ecart_type[l][j] != 0:
+                    p = 1/(sqrt(2*pi)*ecart_type[l][j]) * e**(-1/2*((inconnus[i][j]-moyenne[l][j])/ecart_type[l][j])**2)
+                else:
+                    p = 0
+                Probabilite[i][l] *= p
+    return Probabilite
+
+def textes_bayes(N, k = 3, p = 10):
+    """N textes de p composantes répartis entre k catégories gaussiennes."""
+    centres = np.random.randn(k, p)
+    echelles = 0.5 + np.random.rand(k, p)
+    textes = []
+    for i in range(N):
+        c = i % k
+        t = TexteBidon(centres[c] + echelles[c] * np.random.randn(p))
+        t.categorie = c
+        textes.append(t)
+    return textes, list(range(k))
+
+def test_bayes(N = 300, nb_eval = 50, p = 10, k = 3):
+    """Compare les anciennes f et g (boucles, densités) à Bayes : les probabilités normalisées ne doivent différer que de quelques fois lissage (1e-9), et Bayes doit coïncider avec f et g."""
+    textes, categories = textes_bayes(N + nb_eval, k, p)
+    training_set, eval_set = textes[:N], textes[N:]
+    d = time()
+    moyenne, ecart_type = f_boucle([t.vecteur for t in training_set], [t.categorie for t in training_set], categories)
+    P1 = g_boucle(moyenne, ecart_type, [t.vecteur for t in eval_set])
+    P1 = P1 / P1.sum(axis = 1)[:, None]
+    t1 = time() - d
+    d = time()
+    classifieur = Bayes()
+    classifieur.classifier(training_set, eval_set, categories)
+    t2 = time() - d
+    moyenne, ecart_type = f([t.vecteur for t in training_set], [t.categorie for t in training_set], categories)
+    P3 = g(moyenne, ecart_type, [t.vecteur for t in eval_set])
+    print("Boucles {:.4f}s, Bayes {:.4f}s".format(t1, t2))
+    print("Ecart maximal aux anciennes probabilités : Bayes {:.2e}, f et g {:.2e}".format(np.abs(classifieur.p - P1).max(), np.abs(P3 - P1).max()))
+    print("Bayes et f, g identiques : {}".format(np.allclose(classifieur.p, P3, rtol = 0, atol = 1e-12)))
+
+## Leave one out
+
+def leave_one_out_boucle(createur_classifieur, textes, categories):
+    """Leave one out par N apprentissages, comme CrossValidation.valider sans rééquilibrage des plis."""
+    predictions = []
+    for i in range(len(textes)):
+        classifieur = createur_classifieur()
+        classifieur.classifier(textes[:i] + textes[i+1:], [textes[i]], categories)
+        predictions.append(np.argmax(classifieur.p[0]))
+    return np.array(predictions)
+
+def test_leave_one_out(tailles = [60, 300, 1000], p = 10, k = 3):
+    """Compare les prédictions de Bayes.predictions_leave_one_out à celles de N apprentissages, avec et sans a priori, une catégorie n'ayant qu'un seul texte."""
+    for N in tailles:
+        textes, categories = textes_bayes(N, k, p)
+        textes[-1].categorie = k
+        categories = categories + [k]
+        for a_priori in [False, True]:
+            createur = lambda: Bayes(a_priori = a_priori)
+            d = time()
+            P1 = leave_one_out_boucle(createur, textes, categories)
+            t1 = time() - d
+            d = time()
+            P2 = createur().predictions_leave_one_out(textes, categories)
+            t2 = time() - d
+            print("N = {}, a priori {} : N apprentissages {:.3f}s, une passe {:.4f}s, prédictions identiques : {}".format(N, a_priori, t1, t2, np.array_equal(P1, P2)))
@@ -1,9 +1,11 @@
 import numpy as np
 
 def defuzze(p):
+    """Met à 1 la plus grande probabilité de chaque ligne de p et les autres à 0. Une ligne nulle (texte non attribué, voir Classifieur.attribuer_clusters) reste nulle."""
     (N,k) = p.shape
     res = np.zeros((N,k))
     for i in range(N):
-        j = np.argmax(p[i])
-        res[i,j] = 1
+        if np.any(p[i]):
+            j = np.argmax(p[i])
+            res[i,j] = 1
     return res
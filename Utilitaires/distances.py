@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import numpy as np
+from scipy import sparse
+from scipy.spatial.distance import pdist, cdist, squareform
+
+# Métriques disponibles :
+# - "euclidienne" : norme 2 de la différence
+# - "l1" : somme des valeurs absolues des différences
+# - "rbf" : similarité exp(-gamma * ||x - y||² / d), d étant la dimension (noyau RBF de Verification.similarite)
+metriques_scipy = {"euclidienne" : "euclidean", "l1" : "cityblock", "rbf" : "sqeuclidean"}
+
+# Nombre maximal de coefficients calculés à la fois par distances_entre
+taille_max_bloc = 2**22
+
+
+def matrice_vecteurs(textes):
+    """Matrice dont les lignes sont les vecteurs des textes : creuse (CSR) si les vecteurs le sont, dense sinon. Les fonctions de ce module ne la densifient que par blocs de lignes."""
+    if sparse.issparse(textes[0].vecteur):
+        return sparse.vstack([t.vecteur for t in textes]).tocsr()
+    return np.array([t.vecteur for t in textes], dtype=float)
+
+def dense(X):
+    return X.toarray() if sparse.issparse(X) else np.asarray(X, dtype=float)
+
+def appliquer_metrique(D, metrique, gamma, dimension):
+    if metrique == "rbf":
+        return np.exp(-gamma * D / max(dimension, 1))
+    return D
+
+def distances_condensees(X, metrique = "euclidienne", gamma = 1):
+    """Distances (ou similarités pour "rbf") entre toutes les paires de lignes de X, sous forme condensée : le vecteur des N(N-1)/2 valeurs pour i < j, dans l'ordre de scipy.spatial.distance.squareform.
+    Si X est creuse, les distances sont calculées par blocs de lignes, chacun densifié à son tour : aucun calcul intermédiaire ne dépasse taille_max_bloc coefficients."""
+    if not sparse.issparse(X):
+        X = np.asarray(X, dtype=float)
+        return appliquer_metrique(pdist(X, metriques_scipy[metrique]), metrique, gamma, X.shape[1])
+    X = X.tocsr()
+    N, p = X.shape
+    res = np.empty(N * (N - 1) // 2)
+    taille_blocs = max(1, taille_max_bloc // max(N, p))
+    position = 0
+    for debut in range(0, N, taille_blocs):
+        fin = min(debut + taille_blocs, N)
+        A = X[debut:fin].toarray()
+        # Distances entre les lignes du bloc et toutes les lignes suivantes, calculées par blocs de colonnes
+        R = np.empty((fin - debut, N - debut))
+        for debut_colonnes in range(debut, N, taille_blocs):
+            fin_colonnes = min(debut_colonnes + taille_blocs, N)
+            R[:, debut_colonnes - debut:fin_colonnes - debut] = cdist(A, X[debut_colonnes:fin_colonnes].toarray(), metriques_scipy[metrique])
+        for i in range(debut, fin):
+            longueur = N - i - 1
+            res[position:position + longueur] = R[i - debut, i - debut + 1:]
+            position += longueur
+    return appliquer_metrique(res, metrique, gamma, p)
+
+def distances_entre(X, Y, metrique = "euclidienne", gamma = 1):
+    """Matrice des distances (ou similarités) entre les lignes de X et celles de Y, calculée par blocs de lignes de X pour ne pas dépasser taille_max_bloc coefficients intermédiaires.
+    Si X est creuse, elle n'est densifiée qu'un bloc à la fois, et la taille des blocs tient compte de cette densification."""
+    Y = dense(Y)
+    res = np.empty((X.shape[0], len(Y)))
+    # Un bloc de X creuse densifié compte aussi dans les coefficients intermédiaires
+    largeur = max(len(Y), X.shape[1] if sparse.issparse(X) else 1)
+    taille_blocs = max(1, taille_max_bloc // largeur)
+    for debut in range(0, X.shape[0], taille_blocs):
+        fin = debut + taille_blocs
+        res[debut:fin] = appliquer_metrique(cdist(dense(X[debut:fin]), Y, metriques_scipy[metrique]), metrique, gamma, X.shape[1])
+    return res
+
+
+# Matrices condensées déjà calculées, indexées par le contenu de la matrice des vecteurs et la métrique : tous les utilisateurs d'un même jeu de vecteurs partagent un seul calcul
+# Leur taille totale ne dépasse pas taille_max_cache octets : les plus anciennes sont retirées d'abord, et une matrice plus grande que la limite n'est pas gardée
+matrices = {}
+taille_max_cache = 2**29
+# Dernière matrice carrée demandée (clé, matrice en lecture seule) : les appels répétés sur les mêmes vecteurs ne la redéveloppent pas
+derniere_carree = [None, None]
+# Clé de contenu des vecteurs des textes, indexée par les objets vecteurs eux-mêmes (voir distances_textes)
+cles_textes = {}
+nb_max_cles_textes = 8
+
+def empreinte(X):
+    """Empreinte du contenu de la matrice X, dense ou creuse, sans la densifier."""
+    h = hashlib.blake2b(digest_size = 16)
+    if sparse.issparse(X):
+        X = X.tocsr()
+        for tableau in (X.data, X.indices, X.indptr):
+            h.update(np.ascontiguousarray(tableau).tobytes())
+    else:
+        h.update(np.ascontiguousarray(X, dtype=float).tobytes())
+    return (X.shape, sparse.issparse(X), h.hexdigest())
+
+def garder(cle, D):
+    if D.nbytes > taille_max_cache:
+        return
+    while sum(M.nbytes for M in matrices.values()) + D.nbytes > taille_max_cache:
+        del matrices[next(iter(matrices))]
+    matrices[cle] = D
+
+def distances_memorisees(X, cle, metrique, gamma, condensee):
+    """Matrice des distances de clé cle (voir matrice_distances), calculée sur X si elle n'est pas dans le cache."""
+    if not condensee and derniere_carree[0] == cle:
+        return derniere_carree[1]
+    if cle in matrices:
+        D = matrices[cle]
+    else:
+        D = distances_condensees(X, metrique, gamma)
+        D.flags.writeable = False
+        garder(cle, D)
+    if condensee:
+        return D
+    carree = squareform(D, checks = False)
+    if metrique == "rbf":
+        np.fill_diagonal(carree, 1)
+    carree.flags.writeable = False
+    derniere_carree[:] = [cle, carree]
+    return carree
+
+def matrice_distances(X, metrique = "euclidienne", gamma = 1, condensee = False):
+    """Renvoie la matrice carrée ou condensée (en lecture seule) des distances (ou similarités pour "rbf") entre les lignes de X, calculée une seule fois par contenu de X.
+    Seule la forme condensée est mise en cache ; la forme carrée en est développée à la demande, et seule la dernière est gardée. Pour "rbf", sa diagonale vaut 1 (similarité d'un vecteur avec lui-même)."""
+    return distances_memorisees(X, (empreinte(X), metrique, gamma), metrique, gamma, condensee)
+
+def distances_textes(textes, metrique = "euclidienne", gamma = 1, condensee = False):
+    """matrice_distances appliquée aux vecteurs de la liste de textes.
+    Tant que les textes gardent les mêmes objets vecteurs, leur matrice est retrouvée sans relire leur contenu : un vecteur modifié sur place après un premier calcul n'est donc pas vu."""
+    vecteurs = [t.vecteur for t in textes]
+    cle_objets = tuple(id(v) for v in vecteurs)
+    entree = cles_textes.get(cle_objets)
+    if entree is None or any(v is not w for v, w in zip(vecteurs, entree[0])):
+        X = matrice_vecteurs(textes)
+        entree = (vecteurs, empreinte(X))
+        if len(cles_textes) >= nb_max_cles_textes:
+            del cles_textes[next(iter(cles_textes))]
+        cles_textes[cle_objets] = entree
+        return distances_memorisees(X, (entree[1], metrique, gamma), metrique, gamma, condensee)
+    cle = (entree[1], metrique, gamma)
+    X = None if cle in matrices or (not condensee and derniere_carree[0] == cle) else matrice_vecteurs(textes)
+    return distances_memorisees(X, cle, metrique, gamma, condensee)
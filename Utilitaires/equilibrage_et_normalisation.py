@@ -2,7 +2,7 @@
 from time import localtime
 import numpy as np
 import random
-import math
+from scipy import sparse
 
 def nb_time():
     lt = localtime()
@@ -23,21 +23,74 @@ def normaliser1(D):
     """ argument : une matrice D
         chaque ligne de la matrice D correspond à un point du feature space, autrement dit à un vecteur de données
         chaque colonne de la matrice D correspond à une composante des vecteurs de données
-        cette fonction normalise en centrant et en réduisant chaque composante avec sa moyenne et son écart-type"""
-    M = D.mean(axis = 0)
-    V = D.var(axis = 0)
-    A = np.zeros(D.shape)
-    for i in range(D.shape[0]):
-        for j in range(D.shape[1]):
-            if V[j] == 0:
-                A[i][j] = 0
-            else:
-                A[i][j] = (D[i][j] - M[j])/np.sqrt(V[j])
-    for i in range(len(A)):
-        for j in range(len(A[0])):
-            if math.isnan(A[i,j]):
-                A[i,j] = 0
-    return A
+        cette fonction normalise en centrant et en réduisant chaque composante avec sa moyenne et son écart-type
+        si D est une matrice creuse, voir normaliser_creux"""
+    if sparse.issparse(D):
+        return normaliser_creux(D)
+    return Normaliseur().fit(D).transform(D)
+
+def normaliser_creux(D):
+    """ argument : une matrice creuse D, disposée comme pour normaliser1
+        chaque composante est seulement réduite par son écart-type : la centrer remplirait la matrice
+        les composantes de variance nulle sont mises à 0, comme dans normaliser1"""
+    return Normaliseur(centrer = False).fit(D).transform(D)
+
+
+class Normaliseur:
+    """Centre et réduit chaque composante avec la moyenne et l'écart-type appris par fit, comme normaliser1, mais les statistiques sont gardées : on peut normaliser de nouveaux vecteurs par transform sans les recalculer, et enregistrer le normaliseur (par pickle) avec le modèle.
+    partial_fit met à jour les statistiques avec un nouveau lot de lignes (formules de Welford-Chan), pour les matrices qui arrivent par morceaux.
+    Les composantes de variance nulle, ou dont la moyenne n'est pas définie, sont mises à 0. Si centrer est faux (toujours le cas pour une matrice creuse), les composantes sont seulement réduites."""
+
+    def __init__(self, centrer = True):
+        self.centrer = centrer
+        self.n = 0
+        self.moyenne = None
+        self.variance = None
+
+    def fit(self, D):
+        self.n = 0
+        return self.partial_fit(D)
+
+    def partial_fit(self, D):
+        n, moyenne, variance = statistiques_colonnes(D)
+        if self.n == 0:
+            self.n, self.moyenne, self.variance = n, moyenne, variance
+        elif n > 0:
+            total = self.n + n
+            delta = moyenne - self.moyenne
+            M2 = self.variance * self.n + variance * n + delta**2 * self.n * n / total
+            self.moyenne = self.moyenne + delta * n / total
+            self.variance = M2 / total
+            self.n = total
+        return self
+
+    def transform(self, D):
+        ecart_type = np.sqrt(self.variance)
+        definie = (self.variance != 0) & ~np.isnan(self.variance)
+        echelle = np.zeros(len(ecart_type))
+        echelle[definie] = 1 / ecart_type[definie]
+        if sparse.issparse(D):
+            return sparse.csr_matrix(sparse.csr_matrix(D, dtype=float).dot(sparse.diags(echelle)))
+        D = np.asarray(D, dtype=float)
+        if self.centrer:
+            A = (D - self.moyenne) / np.where(definie, ecart_type, 1)
+        else:
+            A = D / np.where(definie, ecart_type, 1)
+        A[:, ~definie] = 0
+        A[np.isnan(A)] = 0
+        return A
+
+    def fit_transform(self, D):
+        return self.fit(D).transform(D)
+
+def statistiques_colonnes(D):
+    """Nombre de lignes, moyenne et variance de chaque colonne de D (dense ou creuse)."""
+    if sparse.issparse(D):
+        D = sparse.csr_matrix(D, dtype=float)
+        moyenne = np.asarray(D.mean(axis = 0)).ravel()
+        return D.shape[0], moyenne, np.maximum(np.asarray(D.multiply(D).mean(axis = 0)).ravel() - moyenne**2, 0)
+    D = np.asarray(D, dtype=float)
+    return D.shape[0], D.mean(axis = 0), D.var(axis = 0)
 
 def normaliser2(D):
     """ argument : une matrice D
@@ -58,31 +111,35 @@ def normaliser2(D):
 # print(normaliser2(M))
 
 def random_sample(seed,l,n):
-    rs = seed
-    l2 = []
-    ind = []
-    while len(l2)<n:
-        x = rs % len(l)
-        if x not in ind:
-            l2.append(l[x])
-            ind.append(x)
-        rs = (1103515245 * rs + 12345) % (2**16)
-    return l2
-
-def equilibrer1(liste_textes):
-    textes_par_categorie = {}
-    for t in liste_textes:
-        if t.categorie in textes_par_categorie.keys():
-            textes_par_categorie[t.categorie].append(t)
+    """Renvoie n éléments distincts de l tirés au hasard, de façon reproductible à partir de seed."""
+    return [l[i] for i in np.random.default_rng(seed).choice(len(l), n, replace=False)]
+
+def indices_equilibres(categories, graine = None, politique = "sous"):
+    """Renvoie les indices d'un échantillon de la liste categories (catégorie de chaque élément) avec autant d'éléments par catégorie, catégorie par catégorie dans l'ordre de première apparition.
+    Si politique vaut "sous", on tire sans remise dans chaque catégorie autant d'éléments que dans la plus petite ; si elle vaut "sur", on garde tous les éléments et on complète chaque catégorie par des tirages avec remise jusqu'à la taille de la plus grande.
+    Le tirage ne dépend que de graine, et le temps de calcul est proportionnel au nombre d'éléments."""
+    groupes = {}
+    for i, c in enumerate(categories):
+        groupes.setdefault(c, []).append(i)
+    if len(groupes) == 0:
+        return np.zeros(0, dtype=int)
+    tailles = [len(g) for g in groupes.values()]
+    n = min(tailles) if politique == "sous" else max(tailles)
+    rs = np.random.default_rng(graine)
+    res = []
+    for g in groupes.values():
+        g = np.array(g)
+        if len(g) >= n:
+            res.append(rs.choice(g, n, replace=False))
         else:
-            textes_par_categorie[t.categorie] = [t]
-    n = min([len(l) for l in textes_par_categorie.values()])
-    #print("Graine utilisée : {}".format(seed))
-    #print("Nombre de textes par categorie après équilibrage : " + str(n))
-    liste_textes2 = []
-    for l in textes_par_categorie.values():
-        liste_textes2.extend(random_sample(get_seed(),l,n))
-    return liste_textes2
+            res.append(np.concatenate([g, rs.choice(g, n - len(g))]))
+    return np.concatenate(res)
+
+def equilibrer1(liste_textes, graine = None, politique = "sous"):
+    """Renvoie un échantillon de liste_textes avec autant de textes par catégorie (voir indices_equilibres), tiré avec graine ou, par défaut, la graine du module."""
+    if graine is None:
+        graine = get_seed()
+    return [liste_textes[i] for i in indices_equilibres([t.categorie for t in liste_textes], graine, politique)]
 
 def equilibrer2(liste_textes):
     textes_par_categorie = {}
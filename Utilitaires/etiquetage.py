@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import os
+import atexit
+import multiprocessing
+from treetaggerwrapper import TreeTagger, make_tags
+from Utilitaires.importation_et_pretraitement import importer, formater, importer_par_blocs
+from Utilitaires.stockage import StockOeuvre, EcritureOeuvre, vocabulaire
+
+# Au-delà de cette taille (en octets), un fichier txt est lu et étiqueté par blocs
+taille_max_fichier = 2**24
+taille_bloc = 2**20
+
+
+def creer_tagger(langue):
+    return TreeTagger(TAGLANG = langue)
+
+def etiqueter(tagger, texte_brut):
+    """Renvoie les flux mots, racines et POS obtenus en étiquetant texte_brut avec tagger."""
+    tags = make_tags(tagger.tag_text(texte_brut))
+    mots = [t[0] for t in tags if len(t) == 3]
+    racines = [t[2] for t in tags if len(t) == 3]
+    POS = [t[1] for t in tags if len(t) == 3]
+    return mots, racines, POS
+
+
+# Chaque processus du pool garde le même tagger pendant toute sa vie
+tagger_processus = None
+
+def initialiser_processus(createur_tagger, langue):
+    global tagger_processus
+    tagger_processus = createur_tagger(langue)
+
+def etiqueter_document(texte_brut):
+    return etiqueter(tagger_processus, texte_brut)
+
+def etiqueter_oeuvre(travail):
+    auteur, numero, emplacement_textes = travail
+    texte_brut = formater(importer(auteur, numero, emplacement_textes))
+    mots, racines, POS = etiqueter(tagger_processus, texte_brut)
+    return auteur + str(numero), texte_brut, mots, racines, POS
+
+class ServiceEtiquetage:
+    """Garde ouverts, pour chaque langue, un tagger dans le processus principal et un pool de nb_processus processus ayant chacun son propre tagger.
+    Les taggers ne sont créés qu'à la première demande dans une langue, puis réutilisés pour tous les lots de documents suivants."""
+
+    def __init__(self, nb_processus = 1, createur_tagger = creer_tagger):
+        self.nb_processus = nb_processus
+        self.createur_tagger = createur_tagger
+        self.taggers = {}
+        self.pools = {}
+
+    def tagger(self, langue):
+        if langue not in self.taggers:
+            self.taggers[langue] = self.createur_tagger(langue)
+        return self.taggers[langue]
+
+    def pool(self, langue):
+        if langue not in self.pools:
+            self.pools[langue] = multiprocessing.Pool(self.nb_processus, initializer = initialiser_processus, initargs = (self.createur_tagger, langue))
+        return self.pools[langue]
+
+    def appliquer(self, fonction, travaux, langue, ordonne = True):
+        """Itère sur les fonction(travail) pour chaque travail de travaux, fonction utilisant le tagger de langue du processus qui l'exécute.
+        Un seul travail, ou un service à un seul processus, est traité directement dans le processus principal. Si ordonne est faux, les résultats arrivent dans l'ordre où ils sont terminés."""
+        global tagger_processus
+        if self.nb_processus == 1 or len(travaux) == 1:
+            tagger_processus = self.tagger(langue)
+            return map(fonction, travaux)
+        taille_paquets = max(1, len(travaux) // (4 * self.nb_processus))
+        if ordonne:
+            return self.pool(langue).imap(fonction, travaux, taille_paquets)
+        return self.pool(langue).imap_unordered(fonction, travaux, taille_paquets)
+
+    def etiqueter(self, documents, langue):
+        """Étiquette le lot documents (liste de strings) et renvoie, dans le même ordre, les triplets (mots, racines, POS)."""
+        if len(documents) == 0:
+            return []
+        return list(self.appliquer(etiqueter_document, documents, langue))
+
+    def fermer(self):
+        for pool in self.pools.values():
+            pool.terminate()
+        self.pools = {}
+        self.taggers = {}
+
+
+services = {}
+
+def service_etiquetage(nb_processus = 1):
+    """Renvoie le service d'étiquetage à nb_processus processus partagé par tout le programme."""
+    if nb_processus not in services:
+        services[nb_processus] = ServiceEtiquetage(nb_processus)
+    return services[nb_processus]
+
+@atexit.register
+def fermer_services():
+    for service in services.values():
+        service.fermer()
+
+
+def etiqueter_en_flux(auteur, numero, langue, emplacement_textes, emplacement_oeuvres, service = None):
+    """Étiquette l'oeuvre (auteur, numero) en la lisant par blocs : les blocs sont étiquetés par lots, un par processus de service, et ajoutés au fur et à mesure au stock. La mémoire utilisée ne dépend que de taille_bloc et du nombre de processus, pas de la taille du fichier."""
+    if service is None:
+        service = service_etiquetage()
+    ecriture = EcritureOeuvre(StockOeuvre(emplacement_oeuvres, auteur + str(numero)), vocabulaire(emplacement_oeuvres))
+    nb_mots = 0
+    lot = []
+    for morceau in importer_par_blocs(auteur, numero, emplacement_textes, taille_bloc):
+        lot.append(morceau)
+        if len(lot) == service.nb_processus:
+            nb_mots += ajouter_lot(ecriture, lot, service.etiqueter(lot, langue))
+            lot = []
+    nb_mots += ajouter_lot(ecriture, lot, service.etiqueter(lot, langue))
+    ecriture.terminer()
+    return nb_mots
+
+def ajouter_lot(ecriture, lot, resultats):
+    nb_mots = 0
+    for texte_brut, (mots, racines, POS) in zip(lot, resultats):
+        ecriture.ajouter(texte_brut, mots, racines, POS)
+        nb_mots += len(mots)
+    return nb_mots
+
+def etiqueter_oeuvres(identifiants, langue, emplacement_textes, emplacement_oeuvres, service = None):
+    """Étiquette les oeuvres (auteur, numero) de identifiants avec les processus de service (par défaut le service partagé) et les enregistre dans le stock de emplacement_oeuvres.
+    Les oeuvres sont réparties entre les processus, sauf celles dont le fichier dépasse taille_max_fichier, qui sont étiquetées en flux une par une.
+    Seul le processus principal écrit dans le stock et le vocabulaire."""
+    if len(identifiants) == 0:
+        return
+    if service is None:
+        service = service_etiquetage()
+    grandes = [(auteur, numero) for (auteur, numero) in identifiants if os.path.getsize(emplacement_textes + auteur + str(numero) + ".txt") > taille_max_fichier]
+    for (auteur, numero) in grandes:
+        nb_mots = etiqueter_en_flux(auteur, numero, langue, emplacement_textes, emplacement_oeuvres, service)
+        print("Etiquetage en flux : {} ({} mots)".format(auteur + str(numero), nb_mots))
+    voc = vocabulaire(emplacement_oeuvres)
+    travaux = [(auteur, numero, emplacement_textes) for (auteur, numero) in identifiants if (auteur, numero) not in grandes]
+    if len(travaux) == 0:
+        return
+    print("Etiquetage de {} oeuvres sur {} processus".format(len(travaux), min(service.nb_processus, len(travaux))))
+    resultats = service.appliquer(etiqueter_oeuvre, travaux, langue, ordonne = False)
+    for k, (nom, texte_brut, mots, racines, POS) in enumerate(resultats):
+        StockOeuvre(emplacement_oeuvres, nom).ecrire(texte_brut, mots, racines, POS, voc)
+        print("Etiquetage : {}/{} ({}, {} mots)".format(k + 1, len(travaux), nom, len(mots)))
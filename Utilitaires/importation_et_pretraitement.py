@@ -24,4 +24,38 @@ def formater(raw_text):
     raw_text = re.sub("_","b", raw_text)
     # standardise les espaces et les sauts de ligne
     raw_text = re.sub(r'\s+', ' ', raw_text)
-    return raw_text
\ No newline at end of file
+    return raw_text
+
+def point_de_coupe(texte, fin):
+    """Renvoie une position k <= fin telle que formater(texte[:k]) + formater(texte[k:]) == formater(texte) : juste après la dernière fin de phrase, à défaut devant le dernier espace qui ne suit ni un espace ni un tiret, et -1 s'il n'y en a pas."""
+    k = max(texte.rfind(".", 0, fin), texte.rfind("!", 0, fin), texte.rfind("?", 0, fin))
+    if k >= 0:
+        return k + 1
+    k = -1
+    for espace in re.finditer(r'[^\s-]\s', texte[:fin]):
+        k = espace.start() + 1
+    return k
+
+def importer_par_blocs(auteur, numero, emplacement_corpus, taille_bloc = 2**20):
+    """Version en flux de formater(importer(auteur, numero, emplacement_corpus)) pour les très gros fichiers : lit le fichier par blocs de taille_bloc caractères et renvoie au fur et à mesure des morceaux déjà formatés, coupés de préférence après une fin de phrase.
+    La concaténation des morceaux est égale à formater(importer(auteur, numero, emplacement_corpus))."""
+    with codecs.open(emplacement_corpus + auteur + str(numero) + '.txt', encoding = 'utf-8') as file:
+        reste = ""
+        while True:
+            bloc = file.read(taille_bloc)
+            texte = reste + bloc
+            fin = texte.find("End")
+            if fin >= 0:
+                yield formater(texte[:fin])
+                return
+            if bloc == "":
+                # même comportement que importer quand "End" est absent : raw[0:-1]
+                yield formater(texte[:-1])
+                return
+            # on garde les deux derniers caractères, qui peuvent commencer un "End" coupé entre deux blocs
+            k = point_de_coupe(texte, len(texte) - 2)
+            if k <= 0:
+                reste = texte
+            else:
+                yield formater(texte[:k])
+                reste = texte[k:]
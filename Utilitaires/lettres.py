@@ -4,25 +4,43 @@ lettres = ["a", "z", "e", "r", "t", "y", "u", "i", "o", "p", "q", "s", "d", "f",
            "x", "c", "v", "b", "n"]
 
 
+lettres_speciales = {"fr" : (["à", "â", "é", "è", "ê", "ë", "î", "ï", "ô", "ù", "û", "ü"], ["a", "a", "e", "e", "e", "e", "i", "i", "o", "u", "u", "u"]),
+                     "de" : (["ä", "ö", "ü"], ["a", "o", "u"]),
+                     "es" : (["ñ", "á", "é", "í", "ó", "ú"], ["n", "a", "e", "i", "o", "u"])}
+
+
+class TableCanonique(dict):
+    """Table pour str.translate : une lettre va sur elle-même, une lettre spéciale de la langue sur la lettre correspondante, tout autre caractère sur "-".
+    Les caractères de la dernière sorte sont ajoutés à la table à leur première rencontre, les suivantes sont donc traitées sans repasser par Python."""
+
+    def __missing__(self, code):
+        self[code] = "-"
+        return "-"
+
+tables_canoniques = {}
+
+def table_canonique(langue):
+    if langue not in tables_canoniques:
+        table = TableCanonique()
+        for l in lettres:
+            table[ord(l)] = l
+        speciales, correspondances = lettres_speciales.get(langue, ([], []))
+        for l, c in zip(speciales, correspondances):
+            table[ord(l)] = c
+        tables_canoniques[langue] = table
+    return tables_canoniques[langue]
+
 def representant_canonique(lettre,langue):
-    if lettre in lettres:
-        return lettre
-    else:
-        correspondance_lettres_speciales =[]
-        lettres_speciales = []
-        if langue == "fr":
-            lettres_speciales = ["à", "â", "é", "è", "ê", "ë", "î", "ï", "ô", "ù", "û", "ü"]
-            correspondance_lettres_speciales = ["a", "a", "e", "e", "e", "e", "i", "i", "o", "u", "u", "u"]
-        elif langue == "en":
-            lettres_speciales = []
-            correspondance_lettres_speciales = []
-        elif langue == "de":
-            lettres_speciales = ["ä", "ö", "ü"]
-            correspondance_lettres_speciales = ["a", "o", "u"]
-        elif langue == "es":
-            lettres_speciales = ["ñ", "á", "é", "í", "ó", "ú"]
-            correspondance_lettres_speciales = ["n", "a", "e", "i", "o", "u"]
-        if lettre in lettres_speciales:
-            return correspondance_lettres_speciales[lettres_speciales.index(lettre)]
-        else:
-            return "-"
\ No newline at end of file
+    return table_canonique(langue)[ord(lettre)]
+
+def canonique(texte, langue):
+    """Remplace chaque caractère de texte par son représentant canonique, en un seul appel à str.translate."""
+    return texte.translate(table_canonique(langue))
+
+codes_ascii = np.full(256, -1, dtype=np.int64)
+for i, l in enumerate(lettres):
+    codes_ascii[ord(l)] = i
+
+def codes_lettres(texte, langue):
+    """Renvoie le tableau des positions dans lettres des représentants canoniques des caractères de texte, -1 pour ceux qui ne sont pas des lettres."""
+    return codes_ascii[np.frombuffer(canonique(texte, langue).encode("ascii"), dtype=np.uint8)]
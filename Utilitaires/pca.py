@@ -1,44 +1,139 @@
+import hashlib
 import numpy as np
 
 class PCA:
-    
-    def __init__(self,donnees):
-        self.X = donnees
-        s = np.shape(self.X)
-        self.n = s[0]
-        self.p = s[1]
-        self.G = self.X.mean(axis = 0)
-        self.V = self.X.var(axis = 0)
-        self.Xc = self.X - self.G
-        self.S = np.cov(np.transpose(self.Xc))
-        #e = np.linalg.eig(self.S)
-        e2 = np.linalg.svd(self.S)
-        #print(e)
-        #print(e2)
-        v = e2[1]
-        w = e2[0]
-        unsorted_pairs = [(v[j],w[j]) for j in range(self.p)]
-        sorted_pairs = sorted(unsorted_pairs, key = lambda pair : -pair[0])
-        self.vals = [pair[0] for pair in sorted_pairs]
-        self.vects = [pair[1] for pair in sorted_pairs]
-        #print("vecteurs propres")
-        #print(self.vects)
-        #print("valeurs propres")
-        #print(self.vals)
-        s = sum(self.vals)
-        print(s)
-        self.explained_variance = [self.vals[j]/s for j in range(self.p)]
-        self.A = np.array(self.vects)
-        self.Y = np.dot(self.Xc,np.transpose(self.A))
-        
-def pca(vecteurs):
-    donnees = np.array(vecteurs)
-    my_pca = PCA(donnees)
-    return my_pca.Y
-
-def pca_matrice(vecteurs):
-    donnees = np.array(vecteurs)
-    my_pca = PCA(donnees)
-    return my_pca.Y, my_pca.A
-
-#p = PCA(vecteurs)
\ No newline at end of file
+    """Analyse en composantes principales, avec fit / transform.
+    - nb_composantes = nombre d'axes gardés (tous si None)
+    - methode = "covariance" (diagonalisation de la matrice de covariance p×p), "gram" (de la matrice de Gram n×n, pour p bien plus grand que n), "aleatoire" (SVD tronquée aléatoire, quand on ne veut que les premiers axes) ou "auto" pour choisir selon la forme des données
+    partial_fit permet d'apprendre les axes sur des lots successifs (PCA incrémentale), sans garder toutes les données en mémoire.
+    Après fit, A contient les axes (un par ligne, par variance décroissante), vals les variances correspondantes et explained_variance leur part de la variance totale."""
+
+    def __init__(self, nb_composantes = None, methode = "auto", graine = 0, nb_iterations = 4, surechantillonnage = 10):
+        self.nb_composantes = nb_composantes
+        self.methode = methode
+        self.graine = graine
+        self.nb_iterations = nb_iterations
+        self.surechantillonnage = surechantillonnage
+        self.n = 0
+        self.G = None
+        self.A = None
+        self.vals = None
+        self.explained_variance = None
+
+    def choisir_methode(self, n, p):
+        if self.methode != "auto":
+            return self.methode
+        if self.nb_composantes is not None and 2 * self.nb_composantes < min(n, p):
+            return "aleatoire"
+        if p > n:
+            return "gram"
+        return "covariance"
+
+    def fit(self, X):
+        X = np.asarray(X, dtype=float)
+        n, p = X.shape
+        self.n = n
+        self.G = X.mean(axis = 0)
+        Xc = X - self.G
+        k = min(n, p) if self.nb_composantes is None else min(self.nb_composantes, n, p)
+        methode = self.choisir_methode(n, p)
+        if methode == "gram":
+            vals, vects = axes_gram(Xc)
+        elif methode == "aleatoire":
+            vals, vects = axes_aleatoires(Xc, k, self.graine, self.nb_iterations, self.surechantillonnage)
+        else:
+            vals, vects = axes_covariance(Xc)
+        self.fixer_axes(vals[:k], vects[:k], (Xc**2).sum())
+        return self
+
+    def partial_fit(self, X):
+        """Met à jour la moyenne et les axes avec le lot X : les axes courants, pondérés par leurs valeurs singulières, sont décomposés avec le lot centré et la correction due au déplacement de la moyenne."""
+        X = np.asarray(X, dtype=float)
+        n = len(X)
+        moyenne = X.mean(axis = 0)
+        Xc = X - moyenne
+        inertie = (Xc**2).sum()
+        if self.n == 0:
+            total, G, B = n, moyenne, Xc
+        else:
+            total = self.n + n
+            G = self.G + (moyenne - self.G) * n / total
+            correction = np.sqrt(self.n * n / total) * (moyenne - self.G)
+            inertie += self.inertie + (correction**2).sum()
+            B = np.vstack([np.sqrt(self.carres)[:, None] * self.A, Xc, correction[None, :]])
+        _, s, Vt = np.linalg.svd(B, full_matrices = False)
+        k = len(s) if self.nb_composantes is None else min(self.nb_composantes, len(s))
+        self.n = total
+        self.G = G
+        self.fixer_axes(s[:k]**2, orienter(Vt[:k]), inertie)
+        return self
+
+    def fixer_axes(self, carres, vects, inertie):
+        """carres = sommes des carrés des données centrées le long de chaque axe, inertie = somme totale des carrés."""
+        self.carres = carres
+        self.inertie = inertie
+        self.A = vects
+        self.vals = carres / max(self.n - 1, 1)
+        self.explained_variance = carres / inertie if inertie > 0 else np.zeros(len(carres))
+
+    def transform(self, X):
+        return np.dot(np.asarray(X, dtype=float) - self.G, np.transpose(self.A))
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+
+def orienter(vects):
+    """Choisit le signe de chaque axe pour que sa plus grande coordonnée soit positive : les axes ne dépendent alors pas de la méthode de calcul."""
+    signes = np.sign(vects[np.arange(len(vects)), np.abs(vects).argmax(axis = 1)])
+    signes[signes == 0] = 1
+    return vects * signes[:, None]
+
+def axes_covariance(Xc):
+    valeurs, vecteurs = np.linalg.eigh(np.dot(np.transpose(Xc), Xc))
+    ordre = np.argsort(-valeurs)
+    return np.maximum(valeurs[ordre], 0), orienter(np.transpose(vecteurs[:, ordre]))
+
+def axes_gram(Xc):
+    """Axes obtenus à partir de la matrice de Gram Xc.Xc^T (n×n) : si Xc.Xc^T u = s² u, l'axe correspondant est Xc^T u / s. Les axes de variance négligeable sont abandonnés."""
+    valeurs, vecteurs = np.linalg.eigh(np.dot(Xc, np.transpose(Xc)))
+    ordre = np.argsort(-valeurs)
+    valeurs, vecteurs = valeurs[ordre], vecteurs[:, ordre]
+    gardes = valeurs > max(valeurs[0], 0) * len(valeurs) * np.finfo(float).eps
+    valeurs, vecteurs = valeurs[gardes], vecteurs[:, gardes]
+    return valeurs, orienter(np.transpose(np.dot(np.transpose(Xc), vecteurs) / np.sqrt(valeurs)))
+
+def axes_aleatoires(Xc, k, graine, nb_iterations, surechantillonnage):
+    """SVD tronquée aléatoire (Halko, Martinsson, Tropp) : on projette Xc sur k + surechantillonnage directions aléatoires, affinées par nb_iterations itérations de la puissance, puis on décompose la petite matrice obtenue."""
+    n, p = Xc.shape
+    l = min(k + surechantillonnage, n, p)
+    Q = np.dot(Xc, np.random.default_rng(graine).standard_normal((p, l)))
+    Q, _ = np.linalg.qr(Q)
+    for i in range(nb_iterations):
+        Q, _ = np.linalg.qr(np.dot(np.transpose(Xc), Q))
+        Q, _ = np.linalg.qr(np.dot(Xc, Q))
+    _, s, Vt = np.linalg.svd(np.dot(np.transpose(Q), Xc), full_matrices = False)
+    return s[:k]**2, orienter(Vt[:k])
+
+
+# Les PCA déjà calculées, indexées par le contenu des données et le nombre d'axes : refaire une PCA sur les mêmes vecteurs ne coûte que le hachage de la matrice
+ajustements = {}
+nb_max_ajustements = 16
+
+def pca_memorisee(X, nb_composantes = None):
+    """Renvoie la PCA de X à nb_composantes axes et la projection de X, en réutilisant un calcul déjà fait sur une matrice identique."""
+    X = np.ascontiguousarray(X, dtype=float)
+    cle = (X.shape, hashlib.blake2b(X.tobytes(), digest_size = 16).hexdigest(), nb_composantes)
+    if cle not in ajustements:
+        if len(ajustements) >= nb_max_ajustements:
+            del ajustements[next(iter(ajustements))]
+        my_pca = PCA(nb_composantes).fit(X)
+        ajustements[cle] = (my_pca, my_pca.transform(X))
+    return ajustements[cle]
+
+def pca(vecteurs, nb_composantes = None):
+    return pca_memorisee(np.array(vecteurs), nb_composantes)[1].copy()
+
+def pca_matrice(vecteurs, nb_composantes = None):
+    my_pca, Y = pca_memorisee(np.array(vecteurs), nb_composantes)
+    return Y.copy(), my_pca.A.copy()
@@ -2,35 +2,64 @@ import numpy as np
 from Utilitaires import product
 
 def freqs(X,items):
-    res = np.zeros((len(items)))
-    for x in X:
-        if x in items:
-            res[items.index(x)]+=1
-    S = np.sum(res)
-    if (S>0):
-        res = res / np.sum(res)
-    return list(res)
+    """Fréquences dans X des éléments de items, les éléments de X absents de items étant ignorés."""
+    return freqs_codes(encoder(X, items), len(items))
 
 def markov(saut,X,states):
+    """Matrice (aplatie ligne par ligne) des fréquences de transition entre X[i] et X[i+saut], normalisée par état de départ."""
+    return markov_codes(saut, encoder(X, states), len(states))
+
+def encoder(X, items):
+    """Renvoie le tableau des positions dans items des éléments de X (la première position si un élément y figure plusieurs fois), -1 pour ceux qui n'y figurent pas."""
+    index = {}
+    for k in range(len(items) - 1, -1, -1):
+        index[items[k]] = k
+    return np.array([index.get(x, -1) for x in X], dtype=np.int64)
+
+def freqs_codes(codes, n):
+    """Comme freqs, pour une suite de codes entiers (positions dans une liste de n éléments, -1 pour les éléments ignorés)."""
+    return frequences(comptes_codes(codes, n))
 
-    Nij = np.zeros((len(states),len(states)))
-    N = np.zeros((len(states)))
+def comptes_codes(codes, n):
+    """Nombres d'occurrences de chacun des n codes dans codes. Les comptes de deux suites s'additionnent pour donner ceux de leur concaténation."""
+    codes = np.asarray(codes)
+    return np.bincount(codes[codes >= 0], minlength=n).astype(float)
+
+def frequences(comptes):
+    """Fréquences correspondant aux comptes de comptes_codes."""
+    S = np.sum(comptes)
+    if (S>0):
+        comptes = comptes / S
+    return list(comptes)
 
-    res = []
+def markov_codes(saut, codes, n):
+    """Comme markov, pour une suite de codes entiers (positions dans une liste de n états, -1 pour les éléments ignorés)."""
+    return list(markov_sauts([saut], codes, n)[saut].ravel())
 
-    for i in range(len(X)-saut):
-        if (X[i] in states and  X[i+saut] in states):
-            Nij[states.index(X[i]),states.index(X[i+saut])] +=1
-            N[states.index(X[i])]+=1
-    for i in range(len(states)):
-        if (N[i]>0):
-            Nij[i, :] /= N[i]
+def markov_sauts(sauts, codes, n):
+    """Renvoie le dictionnaire saut -> matrice (n, n) des fréquences de transition de markov_codes, pour tous les sauts de sauts comptés en un seul np.bincount."""
+    comptes = comptes_sauts(sauts, codes, n)
+    return {saut : transitions_depuis_comptes(comptes[saut]) for saut in sauts}
 
-    for i in range(len(states)):
-        for j in range(len(states)):
-            res.append(Nij[i,j])
+def comptes_sauts(sauts, codes, n):
+    """Renvoie le dictionnaire saut -> matrice (n, n) des nombres de transitions de i vers j à distance saut dans codes, pour tous les sauts de sauts comptés en un seul np.bincount."""
+    codes = np.asarray(codes).astype(np.int64)
+    cles = [np.zeros(0, dtype=np.int64)]
+    for k, saut in enumerate(sauts):
+        if len(codes) > saut:
+            depart = codes[:len(codes) - saut]
+            arrivee = codes[saut:]
+            garder = (depart >= 0) & (arrivee >= 0)
+            cles.append(k*n*n + depart[garder]*n + arrivee[garder])
+    Nij = np.bincount(np.concatenate(cles), minlength=len(sauts)*n*n).reshape((len(sauts), n, n)).astype(float)
+    return {saut: Nij[k] for k, saut in enumerate(sauts)}
 
-    return res
+def transitions_depuis_comptes(Nij):
+    """Fréquences de transition (normalisées par état de départ) correspondant à la matrice de comptes Nij de comptes_sauts."""
+    Nij = np.array(Nij, dtype=float)
+    N = np.sum(Nij, axis=1)
+    Nij[N > 0, :] /= N[N > 0, np.newaxis]
+    return Nij
 
 def serie_temporelle(X,s):
     idx = np.where(X==s)[0]
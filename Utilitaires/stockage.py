@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+
+champs = ["mots", "racines", "POS"]
+
+type_identifiants = np.int32
+
+# Version du format des statistiques stockées par StockCaracteristiques, à augmenter à chaque changement de leur signification
+# 1 : fréquences ; 2 : comptes bruts, additifs d'un morceau à l'autre
+version_caracteristiques = 2
+
+
+class Vocabulaire:
+    """Vocabulaire partagé par toutes les oeuvres d'une même langue : associe à chaque chaîne (mot, racine ou POS) un identifiant entier.
+    Il est enregistré dans le fichier vocabulaire.txt, une chaîne par ligne dans l'ordre des identifiants. On ne fait qu'ajouter des lignes à la fin du fichier, donc un identifiant attribué ne change jamais.
+    Un seul processus doit écrire dans un vocabulaire donné à la fois."""
+
+    def __init__(self, emplacement):
+        self.fichier = os.path.join(emplacement, "vocabulaire.txt")
+        self.chaines = []
+        self.index = {}
+        self.tables = {}
+        if os.path.exists(self.fichier):
+            with open(self.fichier, "r", encoding="utf-8", newline="\n") as fichier:
+                for ligne in fichier:
+                    self.ajouter(ligne[:-1])
+        self.nb_enregistrees = len(self.chaines)
+
+    def __len__(self):
+        return len(self.chaines)
+
+    def ajouter(self, chaine):
+        """Renvoie l'identifiant de chaine, en lui en attribuant un nouveau si elle est inconnue."""
+        i = self.index.get(chaine)
+        if i is None:
+            i = len(self.chaines)
+            self.chaines.append(chaine)
+            self.index[chaine] = i
+        return i
+
+    def encoder(self, liste_chaines):
+        """Renvoie le tableau des identifiants de liste_chaines, en complétant le vocabulaire si besoin."""
+        return np.array([self.ajouter(x) for x in liste_chaines], dtype=type_identifiants)
+
+    def decoder(self, identifiants):
+        """Renvoie la liste des chaînes correspondant au tableau d'identifiants."""
+        chaines = self.chaines
+        return [chaines[i] for i in np.asarray(identifiants).tolist()]
+
+    def table(self, items):
+        """Renvoie le tableau qui à chaque identifiant du vocabulaire associe la position de la chaîne correspondante dans la liste items (la première si elle y figure plusieurs fois), ou -1 si elle n'y figure pas.
+        Indexé par un flux, il donne directement les codes des éléments du flux dans items."""
+        cle = (tuple(items), len(self.chaines))
+        if cle not in self.tables:
+            table = np.full(len(self.chaines), -1, dtype=type_identifiants)
+            for k in range(len(items) - 1, -1, -1):
+                i = self.index.get(items[k])
+                if i is not None:
+                    table[i] = k
+            self.tables[cle] = table
+        return self.tables[cle]
+
+    def enregistrer(self):
+        """Ajoute à la fin de vocabulaire.txt les chaînes apparues depuis le dernier enregistrement."""
+        if self.nb_enregistrees < len(self.chaines):
+            with open(self.fichier, "a", encoding="utf-8", newline="\n") as fichier:
+                for chaine in self.chaines[self.nb_enregistrees:]:
+                    fichier.write(chaine + "\n")
+            self.nb_enregistrees = len(self.chaines)
+
+
+vocabulaires = {}
+
+def vocabulaire(emplacement):
+    """Renvoie le vocabulaire de l'emplacement donné, chargé une seule fois par processus."""
+    if emplacement not in vocabulaires:
+        vocabulaires[emplacement] = Vocabulaire(emplacement)
+    return vocabulaires[emplacement]
+
+
+class StockOeuvre:
+    """Stockage sur disque d'une oeuvre étiquetée : chaque flux (mots, racines, POS) est un fichier binaire d'identifiants du vocabulaire, lu par projection en mémoire (np.memmap), et le texte brut est un fichier utf-8 à part.
+    Les fichiers sont nommés nom.mots, nom.racines, nom.POS et nom.texte dans le dossier emplacement."""
+
+    def __init__(self, emplacement, nom):
+        self.emplacement = emplacement
+        self.nom = nom
+
+    def chemin(self, champ):
+        return os.path.join(self.emplacement, self.nom + "." + champ)
+
+    def existe(self):
+        return all(os.path.exists(self.chemin(champ)) for champ in champs + ["texte"])
+
+    def lire(self, champ):
+        """Renvoie le flux champ sous forme de tableau d'identifiants en lecture seule, sans le charger en mémoire."""
+        chemin = self.chemin(champ)
+        if os.path.getsize(chemin) == 0:
+            return np.zeros(0, dtype=type_identifiants)
+        return np.memmap(chemin, dtype=type_identifiants, mode="r")
+
+    def lire_texte(self):
+        with open(self.chemin("texte"), "r", encoding="utf-8", newline="") as fichier:
+            return fichier.read()
+
+    def ecrire(self, texte_brut, mots, racines, POS, vocabulaire):
+        ecriture = EcritureOeuvre(self, vocabulaire)
+        ecriture.ajouter(texte_brut, mots, racines, POS)
+        ecriture.terminer()
+
+
+class EcritureOeuvre:
+    """Écrit une oeuvre dans un StockOeuvre, éventuellement par blocs successifs. Les fichiers ne prennent leur nom définitif qu'à l'appel de terminer, une oeuvre interrompue n'est donc jamais considérée comme existante."""
+
+    def __init__(self, stock, vocabulaire):
+        self.stock = stock
+        self.vocabulaire = vocabulaire
+        self.fichiers = {}
+        for champ in champs:
+            self.fichiers[champ] = open(stock.chemin(champ) + ".tmp", "wb")
+        self.fichiers["texte"] = open(stock.chemin("texte") + ".tmp", "w", encoding="utf-8", newline="")
+
+    def ajouter(self, texte_brut, mots, racines, POS):
+        self.fichiers["texte"].write(texte_brut)
+        for champ, flux in zip(champs, [mots, racines, POS]):
+            self.fichiers[champ].write(self.vocabulaire.encoder(flux).tobytes())
+
+    def terminer(self):
+        for fichier in self.fichiers.values():
+            fichier.close()
+        self.vocabulaire.enregistrer()
+        for champ in self.fichiers.keys():
+            os.replace(self.stock.chemin(champ) + ".tmp", self.stock.chemin(champ))
+
+
+def agreger(fonction, t, statistiques, tailles):
+    """Renvoie les comptes de la fonction additive pour le texte t, somme de ceux de morceaux consécutifs de même taille qui le recouvrent exactement et de leurs jonctions, ou None s'il n'y en a pas dans statistiques (dictionnaire (debut, longueur) -> comptes d'une oeuvre).
+    tailles est la liste des longueurs des morceaux de statistiques, de la plus grande à la plus petite : on utilise les plus grands morceaux possibles."""
+    for taille in tailles:
+        if taille >= t.longueur or t.longueur % taille != 0:
+            continue
+        morceaux = [statistiques.get((t.debut + i * taille, taille)) for i in range(t.longueur // taille)]
+        if any(m is None for m in morceaux):
+            continue
+        jonctions = [fonction.jonction(t.oeuvre, t.debut + i * taille, taille) for i in range(1, len(morceaux))]
+        if any(j is None for j in jonctions):
+            continue
+        return sum(morceaux) + sum(jonctions)
+    return None
+
+
+class StockCaracteristiques:
+    """Stockage sur disque des statistiques par texte des fonctions d'analyse, pour ne pas les recalculer d'une analyse à l'autre.
+    Les statistiques de la fonction de clé cle pour les textes de l'oeuvre nom sont dans le fichier emplacement/cle/nom.npz, repérées par la position (debut, longueur) de chaque texte dans l'oeuvre.
+    Changer les paramètres d'une fonction change sa clé : seules ses statistiques sont alors recalculées.
+    Chaque fichier porte la version_caracteristiques avec laquelle il a été écrit : un fichier d'une autre version est ignoré, et remplacé à la prochaine écriture."""
+
+    def __init__(self, emplacement):
+        self.emplacement = emplacement
+
+    def chemin(self, cle, nom):
+        return os.path.join(self.emplacement, cle, nom + ".npz")
+
+    def lire(self, cle, nom):
+        """Renvoie le dictionnaire (debut, longueur) -> statistiques des textes de l'oeuvre nom déjà stockés pour cle."""
+        chemin = self.chemin(cle, nom)
+        if not os.path.exists(chemin):
+            return {}
+        with np.load(chemin) as fichier:
+            if "version" not in fichier.files or int(fichier["version"]) != version_caracteristiques:
+                print("Statistiques {} de {} dans un ancien format : elles seront recalculées".format(cle, nom))
+                return {}
+            return {(int(d), int(l)) : v for d, l, v in zip(fichier["debuts"], fichier["longueurs"], fichier["valeurs"])}
+
+    def ecrire(self, cle, nom, statistiques):
+        """Ajoute au fichier de (cle, nom) les statistiques (dictionnaire (debut, longueur) -> statistiques)."""
+        tout = self.lire(cle, nom)
+        tout.update(statistiques)
+        positions = sorted(tout.keys())
+        chemin = self.chemin(cle, nom)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        with open(chemin + ".tmp", "wb") as fichier:
+            np.savez(fichier, version=np.array(version_caracteristiques), debuts=np.array([p[0] for p in positions]), longueurs=np.array([p[1] for p in positions]), valeurs=np.array([tout[p] for p in positions]))
+        os.replace(chemin + ".tmp", chemin)
+
+    def charger(self, fonction, liste_textes):
+        """Renvoie le dictionnaire k -> statistiques stockées de fonction pour le texte liste_textes[k], pour les textes qui en ont. Seuls les textes issus de Oeuvre.split peuvent en avoir.
+        Pour une fonction additive, un texte absent du stock peut aussi être obtenu à partir de morceaux plus petits consécutifs qui y sont (voir agreger)."""
+        cle = fonction.cle()
+        oeuvres = {}
+        res = {}
+        for k, t in enumerate(liste_textes):
+            if t.oeuvre is None:
+                continue
+            nom = t.oeuvre.stock.nom
+            if nom not in oeuvres:
+                statistiques = self.lire(cle, nom)
+                oeuvres[nom] = (statistiques, sorted({l for (d, l) in statistiques.keys()}, reverse=True))
+            statistiques, tailles = oeuvres[nom]
+            s = statistiques.get((t.debut, t.longueur))
+            if s is None and fonction.additive:
+                s = agreger(fonction, t, statistiques, tailles)
+            if s is not None:
+                res[k] = s
+        return res
+
+    def enregistrer(self, cle, liste_textes, nouvelles):
+        """Stocke pour cle les statistiques nouvelles (dictionnaire k -> statistiques du texte liste_textes[k])."""
+        oeuvres = {}
+        for k, s in nouvelles.items():
+            t = liste_textes[k]
+            if t.oeuvre is not None:
+                oeuvres.setdefault(t.oeuvre.stock.nom, {})[(t.debut, t.longueur)] = np.asarray(s)
+        for nom, statistiques in oeuvres.items():
+            self.ecrire(cle, nom, statistiques)
@@ -5,6 +5,7 @@ import numpy.linalg as alg
 import random as rd
 import matplotlib.pyplot as plt
 from time import time
+from Utilitaires.distances import distances_entre, distances_textes, matrice_vecteurs
 
 def norm(v):
     n = len(v)
@@ -17,13 +18,15 @@ def similarity(texte1, texte2):
     s = np.exp(-gamma*norm(v1-v2)**2) # RBF kernel
     return s
     
+def similarites(textes1, textes2):
+    """Matrice des similarités (même noyau que similarity) entre les textes de textes1 et ceux de textes2."""
+    return distances_entre(matrice_vecteurs(textes1), matrice_vecteurs(textes2), "rbf")
+
 def AS(texte, liste_textes):
-    sim = [similarity(texte, texte2) for texte2 in liste_textes]
-    return np.mean(sim)
+    return np.mean(similarites([texte], liste_textes))
 
 def AGS(liste_textes):
-    group_sim = [AS(texte,liste_textes) for texte in liste_textes]
-    return np.mean(group_sim)
+    return np.mean(distances_textes(liste_textes, "rbf"))
 
 def qual(fp,fn):
     if fp==0:
@@ -119,10 +122,7 @@ class Similarity:
         self.textes_base = rd.sample(textes_base, m)
         self.textes_calibrage = rd.sample(textes_calibrage, m)
 
-        self.M1 = np.zeros((len(textes_base), len(textes_base)))
-        for i in range(len(textes_base)):
-            for j in range(len(textes_base)):
-                self.M1[i,j] = similarity(textes_base[i],textes_base[j])
+        self.M1 = distances_textes(textes_base, "rbf")
         self.AS_base = np.mean(self.M1, axis = 0)
         self.AGS_base = np.mean(self.AS_base)
         self.marge_base = np.sqrt(np.var(self.AS_base))
@@ -130,9 +130,7 @@ class Similarity:
         if len(self.textes_calibrage) > 0:
             self.textes = self.textes_base + self.textes_calibrage
             
-            self.AS_calibrage = []
-            for t in self.textes_calibrage:
-                self.AS_calibrage.append(AS(t,self.textes_base))
+            self.AS_calibrage = list(np.mean(similarites(self.textes_calibrage, self.textes_base), axis = 1))
             self.ADGS_calibrage = np.mean(self.AS_calibrage)
             self.marge_calibrage = np.sqrt(np.var(self.AS_calibrage))
             
@@ -147,10 +145,7 @@ class Similarity:
                     vraie_verif_calibrage.append(True)
                 else:
                     vraie_verif_calibrage.append(False)
-            AS_textes = []
-            for t in self.textes:
-                s = AS(t, self.textes_base)
-                AS_textes.append(s)
+            AS_textes = list(np.mean(similarites(self.textes, self.textes_base), axis = 1))
             Q = []
             FP = []
             FN = []
@@ -207,8 +202,8 @@ class Similarity:
         self.verif = []
         self.vraie_verif = []
         categorie_base = self.textes_base[0].categorie
-        for t in textes_disputes:
-            s = AS(t, self.textes_base)
+        AS_disputes = np.mean(similarites(textes_disputes, self.textes_base), axis = 1) if len(textes_disputes) > 0 else []
+        for t, s in zip(textes_disputes, AS_disputes):
             if s > self.AGS_base - self.a*self.marge_base:
                 # il est suffisamment proche de la base
                 self.verif.append(True)
@@ -36,6 +36,15 @@ def InfosFichier(fichier):
     for row in cursor:
         return row
 
+def ChargerTable():
+    """Charge toute la table textes en une seule requête et renvoie un dictionnaire fichier -> ligne, à consulter à la place de InfosFichier"""
+    cursor.execute("""SELECT * FROM textes""")
+    table = {}
+    for row in cursor:
+        if row[1] not in table:
+            table[row[1]] = row
+    return table
+
         
         
 def ModifierFichier(fichier, champ_modif, valeur_champ_modif):
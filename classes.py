@@ -1,20 +1,26 @@
 # -*- coding: utf-8 -*-
 import codecs
 import csv
+import os
+import multiprocessing
 import pickle
 import numpy as np
-from treetaggerwrapper import TreeTagger, make_tags
+from scipy import sparse
+from treetaggerwrapper import Tag
 from Evaluation import evaluation_externe as ee
 from Evaluation import evaluation_interne as ei
 from Evaluation import evaluation_relative as er
 from Interpretation.importance_composantes import importance, nouveaux_clusters
 from Utilitaires.importation_et_pretraitement import importer, formater
 #from Utilitaires.importation_et_pretraitement_pour_le_chinois import importer
-from Utilitaires.equilibrage_et_normalisation import normaliser1, equilibrer1
+from Utilitaires.equilibrage_et_normalisation import Normaliseur, equilibrer1
 from Utilitaires.defuzze import defuzze
+from Utilitaires.stockage import StockOeuvre, StockCaracteristiques, vocabulaire
+from Utilitaires.stats import encoder
+from Utilitaires.etiquetage import etiqueter_oeuvres, etiqueter_en_flux, service_etiquetage
 from Representation.fenetre import FenetreAffichage
 import random
-from bdd import InfosFichier
+from bdd import InfosFichier, ChargerTable
 
 
 emplacement_maxime = "/Users/maximegodin/Google Drive/Groupe PSC/"
@@ -28,13 +34,25 @@ emplacement_dossier_groupe = emplacement_wang
 
 dico_langues = {"fr" : "francais", "en" : "anglais", "es" : "espagnol", "de" : "allemand", "zh" : "chinois"}
 
+def emplacement_textes(langue):
+    return emplacement_dossier_groupe + "Corpus/" + dico_langues[langue] + "/Fichiers txt/"
+
+def emplacement_oeuvres(langue):
+    return emplacement_dossier_groupe + "Corpus/" + dico_langues[langue] + "/Fichiers oeuvres/"
+
+def emplacement_caracteristiques(langue):
+    return emplacement_dossier_groupe + "Corpus/" + dico_langues[langue] + "/Fichiers caracteristiques/"
+
 class Infos:
 
     """Contient les méta-données concernant notre oeuvre : nom complet de l'auteur, titre de l'oeuvre, année, genre. Ces infos sont extraites du fichier csv (tableur) infos_corpus situé à la racine du dossier Corpus."""
-    def __init__(self,auteur,numero):
-        """Va chercher dans la bdd les données associées à (auteur,numero)"""
+    def __init__(self,auteur,numero, table = None):
+        """Va chercher dans la bdd les données associées à (auteur,numero). Si table (dictionnaire renvoyé par ChargerTable) est fournie, on la consulte au lieu d'interroger la bdd."""
         fichier = auteur + str(numero)
-        infos = InfosFichier(fichier)
+        if table is None:
+            infos = InfosFichier(fichier)
+        else:
+            infos = table.get(fichier)
         if(infos != None):
             self.nom_oeuvre = infos[2]
             self.annee_publication = infos[3]
@@ -69,64 +87,105 @@ class Oeuvre:
             - mots = tableau de strings contenant les mots et unités textuelles (ponctuation)
             - racines = tableau de strings contenant les racines de chaque élément de mots, autrement dit la version du dictionnaire (non conjugée, au singulier masculin, etc.)
             - POS = tableau de strings conenant les parts-of-speech associées à chaque mot, autrement dit sa nature grammaticale (verbe, nom, etc.). Attention : leur expression varie selon la langue du tagger : en français "NOM", en anglais "NN"
+    texte_brut, mots, racines et POS ne sont lus dans le StockOeuvre qu'au premier accès. La méthode flux donne directement les tableaux d'identifiants du vocabulaire de la langue.
             """
 
-    def __init__(self, auteur, numero, langue = "fr"):
-        """Crée l'objet Oeuvre s'il n'existe pas encore et le sauvegarde dans un fichier du même nom. S'il existe déjà, on le reprend simplement dans le fichier."""
+    def __init__(self, auteur, numero, langue = "fr", table_infos = None):
+        """Crée l'objet Oeuvre s'il n'existe pas encore et le sauvegarde dans un fichier du même nom. S'il existe déjà, on le reprend simplement dans le fichier.
+        table_infos est la table des méta-données chargée une fois pour toutes par ChargerTable : l'objet Infos créé ici est partagé par tous les textes issus de l'oeuvre."""
         self.auteur = auteur
         self.numero = numero
         self.langue = langue
         self.categorie = None
-        emplacement_textes = emplacement_dossier_groupe + "Corpus/" + dico_langues[langue] + "/Fichiers txt/"
-        emplacement_oeuvres = emplacement_dossier_groupe + "Corpus/" + dico_langues[langue] + "/Fichiers oeuvres/"
-        #self.infos = Infos(auteur,numero)
+        self.infos = Infos(auteur,numero,table_infos)
+        self.stock = StockOeuvre(emplacement_oeuvres(langue), auteur + str(numero))
+        self.vocabulaire = vocabulaire(emplacement_oeuvres(langue))
+        self._flux = {}
+        self._listes = {}
+        self._texte_brut = None
         print(auteur + str(numero), end = " ")
-        try:
-            with open(emplacement_oeuvres + auteur + str(numero), "rb") as mon_fichier:
-                o = pickle.load(mon_fichier)
-            self.texte_brut = o.texte_brut
-            self.tags = o.tags
-            self.mots = o.mots
-            self.racines = o.racines
-            self.POS = o.POS
+        if self.stock.existe():
             print("(importation terminee)", end = " / ")
+            return
+        try:
+            # ancien format : l'objet Oeuvre entier picklé, que l'on convertit une fois pour toutes
+            with open(emplacement_oeuvres(langue) + auteur + str(numero), "rb") as mon_fichier:
+                o = pickle.load(mon_fichier).__dict__
+            self.stock.ecrire(o["texte_brut"], o["mots"], o["racines"], o["POS"], self.vocabulaire)
+            print("(conversion terminee)", end = " / ")
         except FileNotFoundError:
-            tagger = TreeTagger(TAGLANG = self.langue)
-            self.texte_brut = formater(importer(auteur, numero,emplacement_textes))
-            self.tags = make_tags(tagger.tag_text(self.texte_brut))
-            self.mots = [t[0] for t in self.tags if len(t) == 3]
-            self.racines = [t[2] for t in self.tags if len(t) == 3]
-            self.POS = [t[1] for t in self.tags if len(t) == 3]
-            with open(emplacement_oeuvres + "/" + auteur + str(numero), "wb") as mon_fichier:
-                pickle.dump(self,mon_fichier,protocol = 2)
+            etiqueter_en_flux(auteur, numero, langue, emplacement_textes(langue), emplacement_oeuvres(langue))
             print("(creation terminee)", end = " / ")
 
+    def __getstate__(self):
+        """Pour envoyer l'oeuvre à un autre processus : les flux projetés et les listes décodées n'en font pas partie, ils seront relus dans le stock au besoin."""
+        etat = self.__dict__.copy()
+        etat["_flux"] = {}
+        etat["_listes"] = {}
+        etat["_texte_brut"] = None
+        etat["vocabulaire"] = None
+        return etat
+
+    def __setstate__(self, etat):
+        self.__dict__.update(etat)
+        # Un pickle de l'ancien format (voir __init__) n'a pas de stock : son état est seulement lu pour être converti
+        if "stock" in etat:
+            self.vocabulaire = vocabulaire(self.stock.emplacement)
+
+    def flux(self, champ):
+        """Renvoie le flux champ ("mots", "racines" ou "POS") sous forme de tableau d'identifiants projeté en mémoire."""
+        if champ not in self._flux:
+            self._flux[champ] = self.stock.lire(champ)
+        return self._flux[champ]
+
+    def liste(self, champ):
+        """Renvoie le flux champ décodé en liste de strings, calculée au premier accès."""
+        if champ not in self._listes:
+            self._listes[champ] = self.vocabulaire.decoder(self.flux(champ))
+        return self._listes[champ]
+
+    @property
+    def texte_brut(self):
+        if self._texte_brut is None:
+            self._texte_brut = self.stock.lire_texte()
+        return self._texte_brut
+
+    @property
+    def mots(self):
+        return self.liste("mots")
+
+    @property
+    def racines(self):
+        return self.liste("racines")
+
+    @property
+    def POS(self):
+        return self.liste("POS")
+
+    @property
+    def tags(self):
+        return [Tag(m, p, r) for m, p, r in zip(self.mots, self.POS, self.racines)]
+
     def __equal__(self, oeuvre2):
         return (self.auteur == oeuvre2.auteur) and (self.numero == oeuvre2.numero)
 
     def split(self,taille_morceaux, full_text = False):
-        """Sépare une oeuvre en objets Texte de longueur taille_morceaux possédant les mêmes attributs que l'oeuvre."""
+        """Sépare une oeuvre en objets Texte de longueur taille_morceaux possédant les mêmes attributs que l'oeuvre.
+        Les textes ne copient rien : ce sont des vues (debut, longueur) sur les flux de l'oeuvre."""
         tab_texts = []
         auteur = self.auteur
         numero = self.numero
         langue = self.langue
         categorie = self.categorie
+        infos = self.infos
+        L = len(self.flux("mots"))
         if not full_text:
-            L = len(self.tags)
             for k in range(0,L-taille_morceaux,taille_morceaux):
-                mots = self.mots[k:k+taille_morceaux]
-                texte_brut = " ".join(mots)
-                racines = self.racines[k:k+taille_morceaux]
-                POS = self.POS[k:k+taille_morceaux]
-                T = Texte(auteur,numero,categorie,langue,k//taille_morceaux,texte_brut,mots,racines,POS)
+                T = Texte(auteur,numero,categorie,langue,k//taille_morceaux,None,None,None,None,infos,oeuvre = self,debut = k,longueur = taille_morceaux)
                 tab_texts.append(T)
         elif full_text:
             k = 0
-            mots = self.mots
-            texte_brut = " ".join(mots)
-            racines = self.racines
-            POS = self.POS
-            T = Texte(auteur, numero, categorie, langue, k // taille_morceaux, texte_brut, mots, racines, POS)
+            T = Texte(auteur, numero, categorie, langue, k // taille_morceaux, None, None, None, None, infos, oeuvre = self, debut = 0, longueur = L)
             tab_texts.append(T)
         return tab_texts
 
@@ -135,36 +194,148 @@ class Texte:
     - vecteur = liste de réels correspondant à des caractéristiques littéraires (initialisée à None, elle sera remplie par l'analyseur)
     - composantes_vecteur = liste de strings expliquant la signification littéraire de chaque coordonnée du vecteur associé (ex : "fréquence du 3e mot le plus courant")
     - categorie : son rangement dans la classification, soit donné comme hypothèse (pour training_set) soit résultant de l'algorithme (pour eval_set)
+    Un texte issu de Oeuvre.split est une vue sur l'oeuvre : il ne garde que (oeuvre, debut, longueur), mots, racines et POS sont lus dans les flux de l'oeuvre et texte_brut n'est construit qu'au premier accès.
     """
 
-    def __init__(self,auteur,numero,categorie,langue,numero_morceau,texte_brut,mots,racines,POS):
+    def __init__(self,auteur,numero,categorie,langue,numero_morceau,texte_brut,mots,racines,POS,infos = None, oeuvre = None, debut = 0, longueur = None):
         self.auteur = auteur
         self.numero = numero
         self.categorie = categorie
         self.langue = langue
-        self.infos = Infos(auteur,numero)
+        if infos is None:
+            infos = Infos(auteur,numero)
+        self.infos = infos
         self.numero_morceau = numero_morceau
-        self.texte_brut = texte_brut
-        self.mots = mots
-        self.racines = racines
-        self.POS = POS
+        self.oeuvre = oeuvre
+        self.debut = debut
+        self.longueur = longueur
+        self._texte_brut = texte_brut
+        self._listes = {"mots": mots, "racines": racines, "POS": POS}
         self.vecteur = []
         self.vecteur_pca = None
 
+    def flux(self, champ):
+        """Renvoie le flux champ du texte sous forme de tableau d'identifiants, vue sans copie sur le flux de l'oeuvre."""
+        if self.oeuvre is None:
+            raise ValueError("Le texte {}{} morceau {} n'est pas une vue sur une oeuvre".format(self.auteur, self.numero, self.numero_morceau))
+        return self.oeuvre.flux(champ)[self.debut:self.debut + self.longueur]
+
+    def liste(self, champ):
+        """Renvoie le flux champ décodé en liste de strings : la liste donnée à la création, ou la tranche correspondante de la liste de l'oeuvre."""
+        if self._listes[champ] is not None:
+            return self._listes[champ]
+        return self.oeuvre.liste(champ)[self.debut:self.debut + self.longueur]
+
+    def codes(self, champ, items):
+        """Renvoie le flux champ codé par les positions de ses éléments dans la liste items (-1 pour les éléments absents de items).
+        Pour une vue sur une oeuvre, les codes sont lus dans la table du vocabulaire, sans décoder le flux."""
+        if self.oeuvre is None:
+            return encoder(self.liste(champ), items)
+        return self.oeuvre.vocabulaire.table(items)[self.flux(champ)]
+
+    def nb_distincts(self, champ):
+        """Renvoie le nombre d'éléments différents du flux champ."""
+        if self.oeuvre is None:
+            return len(set(self.liste(champ)))
+        return len(np.unique(self.flux(champ)))
+
+    @property
+    def texte_brut(self):
+        if self._texte_brut is None:
+            self._texte_brut = " ".join(self.mots)
+        return self._texte_brut
+
+    @property
+    def mots(self):
+        return self.liste("mots")
+
+    @property
+    def racines(self):
+        return self.liste("racines")
+
+    @property
+    def POS(self):
+        return self.liste("POS")
+
     def __equal__(self,texte2):
         return (self.auteur == texte2.auteur) and (self.numero == texte2.numero) and (self.numero_morceau == texte2.numero_morceau)
 
     def copy(self):
-        return Texte(self.auteur, self.numero, self.categorie, self.langue, self.numero_morceau, self.texte_brut, self.mots, self.racines, self.POS)
+        return Texte(self.auteur, self.numero, self.categorie, self.langue, self.numero_morceau, self._texte_brut, self._listes["mots"], self._listes["racines"], self._listes["POS"], self.infos, self.oeuvre, self.debut, self.longueur)
 
 class Analyseur:
     def __init__(self, nom, liste_fils):
         self.nom = nom
         self.fils = liste_fils
 
-    def analyser(self, liste_textes):
+    def analyser(self, liste_textes, cache = None):
+        """Ajoute à chaque texte de liste_textes les composantes calculées par les fils.
+        cache est un dictionnaire partagé par toutes les fonctions d'une même analyse, pour les calculs communs à plusieurs d'entre elles : il est créé ici s'il n'est pas donné, et chaque fonction y déclare d'abord ses besoins par preparer."""
+        if cache is None:
+            cache = {}
+            self.preparer(cache)
         for f in self.fils:
-            f.analyser(liste_textes)
+            f.analyser(liste_textes, cache)
+
+    def preparer(self, cache):
+        for f in self.fils:
+            f.preparer(cache)
+
+    def vectoriser(self, liste_textes, nb_processus = 1, stock = None):
+        """Analyse liste_textes et renvoie la matrice dont la ligne k est le vecteur du k-ième texte.
+        La matrice est allouée une seule fois : chaque fonction réserve ses colonnes dans preparer puis les remplit en place, et le vecteur de chaque texte est une vue sur sa ligne.
+        Les fonctions qui le permettent (comme Freq_Ngrammes avec creux vrai) donnent leurs composantes sous forme creuse : la matrice renvoyée est alors une matrice creuse CSR.
+        Avec nb_processus > 1, les textes sont répartis en tranches entre les processus ; les fonctions qui ont besoin de tout le corpus (locale faux) ne calculent dans les processus que leurs statistiques par texte, et sont finalisées ici sur l'ensemble des textes.
+        Si stock (un StockCaracteristiques) est donné, les statistiques par texte des fonctions qui ont une clé y sont reprises, et seules celles qui manquent sont calculées puis ajoutées au stock."""
+        cache = {"colonnes" : {}, "nb colonnes" : 0, "fonctions" : [], "indices" : range(len(liste_textes))}
+        self.preparer(cache)
+        if stock is not None:
+            cache["stockees"] = {numero : stock.charger(f, liste_textes) for numero, f in enumerate(cache["fonctions"]) if f.cle() is not None}
+            cache["nouvelles"] = {}
+        D = np.zeros((len(liste_textes), cache["nb colonnes"]))
+        for k, texte in enumerate(liste_textes):
+            texte.vecteur = D[k]
+        cache["matrice"] = D
+        if nb_processus > 1 and len(liste_textes) > 1:
+            self.analyser_en_parallele(liste_textes, cache, nb_processus)
+        else:
+            self.analyser(liste_textes, cache)
+        if stock is not None:
+            for numero, nouvelles in cache["nouvelles"].items():
+                stock.enregistrer(cache["fonctions"][numero].cle(), liste_textes, nouvelles)
+        blocs_creux = cache.get("blocs creux", [])
+        if "emondage" in cache:
+            garder = np.ones(D.shape[1], dtype=bool)
+            for debut, fin, garder_fonction in cache["emondage"]:
+                garder[debut:fin] = garder_fonction
+            D = D[:, garder]
+            for k, texte in enumerate(liste_textes):
+                texte.vecteur = D[k]
+            nb_gardees = np.concatenate([[0], np.cumsum(garder)])
+            blocs_creux = [(nb_gardees[position], M) for position, M in blocs_creux]
+        return assembler(D, blocs_creux)
+
+    def analyser_en_parallele(self, liste_textes, cache, nb_processus):
+        """Remplit la matrice de cache en répartissant liste_textes en tranches entre nb_processus processus (voir vectoriser)."""
+        nb_tranches = min(len(liste_textes), 4 * nb_processus)
+        bornes = [len(liste_textes) * k // nb_tranches for k in range(nb_tranches + 1)]
+        tranches = [(bornes[k], bornes[k+1]) for k in range(nb_tranches) if bornes[k] < bornes[k+1]]
+        D = cache["matrice"]
+        blocs_creux = {}
+        statistiques = {}
+        with multiprocessing.Pool(nb_processus, initializer = initialiser_analyse, initargs = (self, liste_textes, cache.get("stockees"))) as pool:
+            for (debut, fin), (D_tranche, blocs_tranche, statistiques_tranche, nouvelles_tranche) in zip(tranches, pool.imap(analyser_tranche, tranches)):
+                D[debut:fin] = D_tranche
+                for numero, nouvelles in nouvelles_tranche.items():
+                    cache["nouvelles"].setdefault(numero, {}).update(nouvelles)
+                for position, M in blocs_tranche:
+                    blocs_creux.setdefault(position, []).append(M)
+                for numero, S in statistiques_tranche.items():
+                    statistiques.setdefault(numero, []).extend(S)
+        cache["blocs creux"] = [(position, sparse.vstack(blocs, format="csr")) for position, blocs in blocs_creux.items()]
+        for numero, f in enumerate(cache["fonctions"]):
+            if numero in statistiques:
+                f.finaliser(liste_textes, statistiques[numero], cache)
 
     def noms_composantes(self):
         res = []
@@ -188,6 +359,68 @@ class Analyseur:
     def numeroter(self):
         self.aux_numeroter(0)
 
+def reserver_colonnes(cache, fonction, nb_colonnes):
+    """Réserve à fonction les nb_colonnes suivantes de la matrice d'une analyse faite par Analyseur.vectoriser."""
+    if "colonnes" in cache:
+        debut = cache["nb colonnes"]
+        cache["colonnes"][id(fonction)] = (debut, debut + nb_colonnes)
+        cache["nb colonnes"] = debut + nb_colonnes
+        cache["fonctions"].append(fonction)
+
+# Dans chaque processus d'une analyse parallèle : l'analyseur et la liste complète des textes, reçus une fois pour toutes
+analyse_processus = None
+
+def initialiser_analyse(analyseur, liste_textes, stockees):
+    global analyse_processus
+    analyse_processus = (analyseur, liste_textes, stockees)
+
+def analyser_tranche(tranche):
+    """Analyse les textes debut:fin de la liste du processus. Renvoie les lignes de la matrice, les blocs creux, les statistiques par texte des fonctions non locales et les statistiques nouvellement calculées à stocker (les deux indexées par le numéro de la fonction dans l'ordre de l'analyse)."""
+    analyseur, liste_textes, stockees = analyse_processus
+    debut, fin = tranche
+    textes = liste_textes[debut:fin]
+    cache = {"colonnes" : {}, "nb colonnes" : 0, "fonctions" : [], "indices" : range(debut, fin), "statistiques" : {}, "nouvelles" : {}}
+    if stockees is not None:
+        cache["stockees"] = stockees
+    analyseur.preparer(cache)
+    cache["matrice"] = np.zeros((len(textes), cache["nb colonnes"]))
+    analyseur.analyser(textes, cache)
+    return cache["matrice"], cache.get("blocs creux", []), cache["statistiques"], cache["nouvelles"]
+
+def ecrire_colonnes(cache, fonction, liste_textes, vecteurs):
+    """Écrit les vecteurs (un par texte de liste_textes) dans les colonnes réservées à fonction, ou à défaut les ajoute à la fin du vecteur de chaque texte."""
+    if id(fonction) in cache.get("colonnes", {}):
+        debut, fin = cache["colonnes"][id(fonction)]
+        M = cache["matrice"]
+        for k, v in enumerate(vecteurs):
+            M[k, debut:fin] = v
+    else:
+        for t, v in zip(liste_textes, vecteurs):
+            t.vecteur += list(v)
+
+def emonder_colonnes(cache, fonction, garder):
+    """Indique que, parmi les colonnes réservées à fonction, seules celles où garder est vrai doivent figurer dans la matrice finale."""
+    debut, fin = cache["colonnes"][id(fonction)]
+    cache.setdefault("emondage", []).append((debut, fin, garder))
+
+def ajouter_bloc_creux(cache, fonction, M):
+    """Enregistre dans le cache de l'analyse la matrice creuse M (une ligne par texte), à insérer à l'emplacement réservé à fonction (qui n'a réservé aucune colonne dense)."""
+    position = cache["colonnes"][id(fonction)][0]
+    cache.setdefault("blocs creux", []).append((position, M))
+
+def assembler(D, blocs_creux):
+    """Insère les blocs creux dans la matrice dense D, et renvoie D elle-même s'il n'y en a pas."""
+    if len(blocs_creux) == 0:
+        return D
+    morceaux = []
+    debut = 0
+    for position, M in blocs_creux:
+        morceaux.append(sparse.csr_matrix(D[:, debut:position]))
+        morceaux.append(M)
+        debut = position
+    morceaux.append(sparse.csr_matrix(D[:, debut:]))
+    return sparse.hstack(morceaux, format="csr")
+
 class FonctionAnalyse(Analyseur):
 
     def __init__(self,nom,liste_composantes):
@@ -201,8 +434,62 @@ class FonctionAnalyse(Analyseur):
     def noms_fonctions(self):
         return [self.nom]
 
-    def analyser(self, liste_textes):
-        return
+    # Une fonction locale calcule le vecteur de chaque texte indépendamment des autres textes
+    locale = True
+
+    def analyser(self, liste_textes, cache = None):
+        """Calcule les composantes de chaque texte de liste_textes et les écrit dans les colonnes réservées à la fonction, ou à la fin des vecteurs des textes hors de Analyseur.vectoriser.
+        Dans un processus d'une analyse parallèle, une fonction non locale ne fait que mettre ses statistiques par texte dans le cache."""
+        if cache is None:
+            cache = {}
+            self.preparer(cache)
+        if "statistiques" in cache and not self.locale:
+            cache["statistiques"][cache["fonctions"].index(self)] = list(self.statistiques_stockees(liste_textes, cache))
+        else:
+            self.finaliser(liste_textes, self.statistiques_stockees(liste_textes, cache), cache)
+
+    def cle(self):
+        """Clé des statistiques de la fonction dans un StockCaracteristiques : elle doit contenir tous les paramètres dont elles dépendent. None si elles ne doivent pas être stockées."""
+        return None
+
+    def statistiques_stockees(self, liste_textes, cache):
+        """Comme statistiques, en reprenant celles que l'analyse a trouvées dans son stock. Les autres sont calculées et notées dans le cache pour être stockées à la fin de l'analyse."""
+        if "stockees" not in cache or cache["fonctions"].index(self) not in cache["stockees"]:
+            return self.statistiques(liste_textes, cache)
+        numero = cache["fonctions"].index(self)
+        stockees = cache["stockees"][numero]
+        indices = cache["indices"]
+        manquants = [k for k in range(len(liste_textes)) if indices[k] not in stockees]
+        calculees = list(self.statistiques([liste_textes[k] for k in manquants], cache))
+        nouvelles = {indices[k] : s for k, s in zip(manquants, calculees)}
+        cache["nouvelles"][numero] = nouvelles
+        return [stockees[i] if i in stockees else nouvelles[i] for i in indices]
+
+    def vecteurs(self, liste_textes, cache):
+        """Renvoie (ou génère) pour chaque texte de liste_textes la liste de ses composantes."""
+        return []
+
+    def statistiques(self, liste_textes, cache):
+        """Renvoie (ou génère) pour chaque texte les quantités qui ne dépendent que de lui, et dont finaliser déduit les composantes. Par défaut, ce sont les composantes elles-mêmes."""
+        return self.vecteurs(liste_textes, cache)
+
+    def finaliser(self, liste_textes, statistiques, cache):
+        """Calcule les composantes de liste_textes à partir des statistiques de tous les textes et les écrit."""
+        ecrire_colonnes(cache, self, liste_textes, (self.composantes(s) for s in statistiques))
+
+    def composantes(self, statistiques_texte):
+        """Composantes d'un texte d'une fonction locale, à partir de ses statistiques."""
+        return statistiques_texte
+
+    # Une fonction additive a pour statistiques des comptes : ceux d'un texte formé de plusieurs morceaux consécutifs d'une oeuvre sont la somme des comptes des morceaux et des jonctions entre eux
+    additive = False
+
+    def jonction(self, oeuvre, position, taille):
+        """Comptes à ajouter pour joindre le morceau de oeuvre de longueur taille finissant à position au morceau qui le suit. None si on ne peut pas les déduire ainsi."""
+        return 0
+
+    def preparer(self, cache):
+        reserver_colonnes(cache, self, len(self.liste_composantes))
 
     def aux_numeroter(self, n):
         self.init = n
@@ -224,6 +511,58 @@ class Classifieur:
     def poids_composantes(self, clusters=None):
         return importance(self.clusters)
 
+    def attribuer_clusters(self, etiquettes, distances_clusters = None):
+        """Pour les classifieurs non supervisés : etiquettes donne le numéro de cluster de chaque texte de training_set + eval_set. Chaque cluster reçoit la catégorie la plus représentée parmi ses textes du training_set, puis clusters, p et p_ref sont remplis pour l'eval_set.
+        Un cluster sans texte du training_set reçoit la catégorie du cluster étiqueté le plus proche selon distances_clusters (matrice des distances entre les centres des clusters). Sans elle, ses textes restent non attribués : leur ligne de p est nulle, et ils comptent comme des erreurs."""
+        etiquettes = np.asarray(etiquettes, dtype=int)
+        nb_clusters = etiquettes.max() + 1 if len(etiquettes) > 0 else 0
+        nb_categories = len(self.categories)
+        indices_categories = {c : j for j, c in enumerate(self.categories)}
+        nb_training = len(self.training_set)
+        categories_training = np.array([indices_categories[t.categorie] for t in self.training_set], dtype=int)
+        contingence = np.bincount(etiquettes[:nb_training] * nb_categories + categories_training, minlength = nb_clusters * nb_categories).reshape((nb_clusters, nb_categories))
+        etiquetes = contingence.max(axis = 1) > 0
+        categorie_cluster = np.where(etiquetes, contingence.argmax(axis = 1), -1)
+        if distances_clusters is not None and etiquetes.any() and not etiquetes.all():
+            distances_etiquetes = np.asarray(distances_clusters)[np.ix_(~etiquetes, etiquetes)]
+            categorie_cluster[~etiquetes] = categorie_cluster[etiquetes][distances_etiquetes.argmin(axis = 1)]
+        categories_eval = categorie_cluster[etiquettes[nb_training:]]
+        n = len(self.eval_set)
+        lignes = np.flatnonzero(categories_eval >= 0)
+        self.p = np.zeros((n, nb_categories))
+        self.p[lignes, categories_eval[lignes]] = 1
+        self.p_ref = np.zeros((n, nb_categories))
+        self.p_ref[np.arange(n), [indices_categories[t.categorie] for t in self.eval_set]] = 1
+        self.clusters = [[] for j in range(nb_categories)]
+        for i in lignes:
+            self.clusters[categories_eval[i]].append(self.eval_set[i])
+
+def preparer_oeuvres(id_oeuvres, langue, nb_processus = 1):
+    """Étiquette en parallèle sur nb_processus processus les oeuvres de id_oeuvres (une liste de listes de (auteur,numero)) qui ne sont pas encore dans le stock."""
+    manquantes = []
+    for liste_id in id_oeuvres:
+        for (auteur, numero) in liste_id:
+            nom = auteur + str(numero)
+            if (auteur, numero) not in manquantes and not StockOeuvre(emplacement_oeuvres(langue), nom).existe() and not os.path.exists(emplacement_oeuvres(langue) + nom):
+                manquantes.append((auteur, numero))
+    etiqueter_oeuvres(manquantes, langue, emplacement_textes(langue), emplacement_oeuvres(langue), service_etiquetage(nb_processus))
+
+def charger_oeuvres(id_oeuvres, categories, langue, table_infos):
+    """Crée les objets Oeuvre de id_oeuvres, la k-ième liste de (auteur,numero) recevant la catégorie categories[k]."""
+    oeuvres = []
+    for k in range(len(id_oeuvres)):
+        for (auteur, numero) in id_oeuvres[k]:
+            oeuvre = Oeuvre(auteur,numero,langue,table_infos)
+            oeuvre.categorie = categories[k]
+            oeuvres.append(oeuvre)
+    return oeuvres
+
+def stocker_morceaux(analyseur, oeuvres, taille_morceaux, stock, nb_processus = 1):
+    """Calcule et stocke dans stock les statistiques de tous les morceaux de taille taille_morceaux des oeuvres.
+    Pour les fonctions additives, celles des morceaux dont la taille est un multiple de taille_morceaux s'en déduisent ensuite sans revenir aux textes : c'est ce qui rend peu coûteuse une étude de l'influence de la taille des morceaux."""
+    liste_textes = [t for oeuvre in oeuvres for t in oeuvre.split(taille_morceaux)]
+    analyseur.vectoriser(liste_textes, nb_processus, stock)
+
 class Probleme:
     """Un objet Problème rassemble tous les éléments d'un questionnement d'attribution :
     - liste_oeuvres = liste des objets Oeuvres que l'on veut étudier
@@ -232,30 +571,20 @@ class Probleme:
     - classifieur = objet Classifieur
     """
 
-    def __init__(self, id_training_set, categories, id_eval_set, categories_supposees, taille_morceaux, analyseur, classifieur, langue = "fr", full_text = False):
+    def __init__(self, id_training_set, categories, id_eval_set, categories_supposees, taille_morceaux, analyseur, classifieur, langue = "fr", full_text = False, nb_processus = 1, stocker_caracteristiques = True):
         print("ASSEMBLAGE DU PROBLEME")
         print("")
-        self.oeuvres_training_set = []
-        self.oeuvres_eval_set = []
         self.categories = categories
         self.categories_supposees = categories_supposees
         self.taille_morceaux = taille_morceaux
         self.liste_oeuvres = []
         print("Création - importation des oeuvres : ")
-        for k in range(len(id_training_set)):
-            for ident in id_training_set[k]:
-                auteur = ident[0]
-                numero = ident[1]
-                oeuvre = Oeuvre(auteur,numero,langue)
-                oeuvre.categorie = categories[k]
-                self.oeuvres_training_set.append(oeuvre)
-        for k in range(len(id_eval_set)):
-            for ident in id_eval_set[k]:
-                auteur = ident[0]
-                numero = ident[1]
-                oeuvre = Oeuvre(auteur,numero,langue)
-                oeuvre.categorie = categories_supposees[k]
-                self.oeuvres_eval_set.append(oeuvre)
+        table_infos = ChargerTable()
+        self.nb_processus = nb_processus
+        self.stock_caracteristiques = StockCaracteristiques(emplacement_caracteristiques(langue)) if stocker_caracteristiques else None
+        preparer_oeuvres(id_training_set + id_eval_set, langue, nb_processus)
+        self.oeuvres_training_set = charger_oeuvres(id_training_set, categories, langue, table_infos)
+        self.oeuvres_eval_set = charger_oeuvres(id_eval_set, categories_supposees, langue, table_infos)
         print()
         print("Liste_oeuvres remplie")
         self.analyseur = analyseur
@@ -282,12 +611,14 @@ class Probleme:
         print("Textes de training_set et eval_set initialisés")
 
     def analyser(self, normalisation = False):
-        """Applique la méthode analyser de l'analyseur : elle remplit les coordonnées du vecteur associé à chaque texte, et calcule le vecteur normalisé."""
-        self.analyseur.analyser(self.liste_textes)
-        D = np.array([texte.vecteur for texte in self.liste_textes])
+        """Applique la méthode analyser de l'analyseur : elle remplit les coordonnées du vecteur associé à chaque texte, et calcule le vecteur normalisé.
+        Les statistiques de normalisation sont apprises sur le training_set seul et gardées dans self.normaliseur."""
+        D = self.analyseur.vectoriser(self.liste_textes, self.nb_processus, self.stock_caracteristiques)
         A = D
+        self.normaliseur = None
         if normalisation:
-            A = normaliser1(D)
+            self.normaliseur = Normaliseur().fit(D[:len(self.training_set)])
+            A = self.normaliseur.transform(D)
         for k,texte in enumerate(self.liste_textes):
             texte.vecteur = A[k]
         print("Textes analysés et vectorisés")
@@ -403,47 +734,27 @@ class Probleme:
 
 class Verification:
     
-    def __init__(self, id_oeuvres_base, categories_base, id_oeuvres_calibrage, categories_calibrage, id_oeuvres_disputees, categories_disputees, taille_morceaux, analyseur, verificateur, langue = "fr", full_text = False):
+    def __init__(self, id_oeuvres_base, categories_base, id_oeuvres_calibrage, categories_calibrage, id_oeuvres_disputees, categories_disputees, taille_morceaux, analyseur, verificateur, langue = "fr", full_text = False, nb_processus = 1, stocker_caracteristiques = True):
         print("Assemblage du problème de vérification")
         self.id_oeuvres_base = id_oeuvres_base
         self.id_oeuvres_calibrage = id_oeuvres_calibrage
         self.id_oeuvres_disputees = id_oeuvres_disputees
-        self.liste_id_oeuvres_base = []
-        self.liste_id_oeuvres_calibrage = []
-        self.liste_id_oeuvres_disputees = []
-        self.oeuvres_base = []
-        self.oeuvres_calibrage = []
-        self.oeuvres_disputees = []
+        self.liste_id_oeuvres_base = [ident for liste_id in id_oeuvres_base for ident in liste_id]
+        self.liste_id_oeuvres_calibrage = [ident for liste_id in id_oeuvres_calibrage for ident in liste_id]
+        self.liste_id_oeuvres_disputees = [ident for liste_id in id_oeuvres_disputees for ident in liste_id]
         self.categories_base = categories_base
         self.categories_calibrage = categories_calibrage
         self.categories_disputees = categories_disputees
         self.taille_morceaux = taille_morceaux
         self.liste_oeuvres = []
         print("Création - importation des oeuvres : ")
-        for k in range(len(id_oeuvres_base)):
-            for ident in id_oeuvres_base[k]:
-                auteur = ident[0]
-                numero = ident[1]
-                oeuvre = Oeuvre(auteur,numero,langue)
-                oeuvre.categorie = categories_base[k]
-                self.oeuvres_base.append(oeuvre)
-                self.liste_id_oeuvres_base.append((auteur,numero))
-        for k in range(len(id_oeuvres_calibrage)):
-            for ident in id_oeuvres_calibrage[k]:
-                auteur = ident[0]
-                numero = ident[1]
-                oeuvre = Oeuvre(auteur,numero,langue)
-                oeuvre.categorie = categories_calibrage[k]
-                self.oeuvres_calibrage.append(oeuvre)
-                self.liste_id_oeuvres_calibrage.append((auteur,numero))
-        for k in range(len(id_oeuvres_disputees)):
-            for ident in id_oeuvres_disputees[k]:
-                auteur = ident[0]
-                numero = ident[1]
-                oeuvre = Oeuvre(auteur,numero,langue)
-                oeuvre.categorie = categories_disputees[k]
-                self.oeuvres_disputees.append(oeuvre)
-                self.liste_id_oeuvres_disputees.append((auteur,numero))
+        table_infos = ChargerTable()
+        self.nb_processus = nb_processus
+        self.stock_caracteristiques = StockCaracteristiques(emplacement_caracteristiques(langue)) if stocker_caracteristiques else None
+        preparer_oeuvres(id_oeuvres_base + id_oeuvres_calibrage + id_oeuvres_disputees, langue, nb_processus)
+        self.oeuvres_base = charger_oeuvres(id_oeuvres_base, categories_base, langue, table_infos)
+        self.oeuvres_calibrage = charger_oeuvres(id_oeuvres_calibrage, categories_calibrage, langue, table_infos)
+        self.oeuvres_disputees = charger_oeuvres(id_oeuvres_disputees, categories_disputees, langue, table_infos)
         print("")
         print("Liste_oeuvres remplie")
         self.analyseur = analyseur
@@ -481,12 +792,14 @@ class Verification:
         print("Ensemble de verif : {} textes".format(len(self.textes_disputes)))
 
     def analyser(self, normalisation = True):
-        """Applique la méthode analyser de l'analyseur : elle remplit les coordonnées du vecteur associé à chaque texte, et calcule le vecteur normalisé."""
-        self.analyseur.analyser(self.liste_textes)
-        D = np.array([texte.vecteur for texte in self.liste_textes])
+        """Applique la méthode analyser de l'analyseur : elle remplit les coordonnées du vecteur associé à chaque texte, et calcule le vecteur normalisé.
+        Les statistiques de normalisation sont apprises sur les textes de base seuls et gardées dans self.normaliseur."""
+        D = self.analyseur.vectoriser(self.liste_textes, self.nb_processus, self.stock_caracteristiques)
         A = D
+        self.normaliseur = None
         if normalisation:
-            A = normaliser1(D)
+            self.normaliseur = Normaliseur().fit(D[:len(self.textes_base)])
+            A = self.normaliseur.transform(D)
         for k,texte in enumerate(self.liste_textes):
             texte.vecteur = A[k]
         print("Textes analysés et vectorisés")
@@ -511,21 +824,18 @@ class Verification:
 
 
 class CrossValidation:
-    def __init__(self, id_oeuvres, categories, taille_morceaux, analyseur, createur_classifieur, pourcentage_eval = 0.1, nombre_essais = 20, langue = "fr", full_text = False, leave_one_out = False):
+    def __init__(self, id_oeuvres, categories, taille_morceaux, analyseur, createur_classifieur, pourcentage_eval = 0.1, nombre_essais = 20, langue = "fr", full_text = False, leave_one_out = False, nb_processus = 1, stocker_caracteristiques = True, equilibrer_plis = True):
         print("ASSEMBLAGE DE LA VALIDATION CROISEE")
         print("")
-        self.oeuvres = []
         self.categories = categories
         self.taille_morceaux = taille_morceaux
         self.liste_oeuvres = []
         print("Création - importation des oeuvres : ")
-        for k in range(len(id_oeuvres)):
-            for ident in id_oeuvres[k]:
-                auteur = ident[0]
-                numero = ident[1]
-                oeuvre = Oeuvre(auteur,numero,langue)
-                oeuvre.categorie = categories[k]
-                self.oeuvres.append(oeuvre)
+        table_infos = ChargerTable()
+        self.nb_processus = nb_processus
+        self.stock_caracteristiques = StockCaracteristiques(emplacement_caracteristiques(langue)) if stocker_caracteristiques else None
+        preparer_oeuvres(id_oeuvres, langue, nb_processus)
+        self.oeuvres = charger_oeuvres(id_oeuvres, categories, langue, table_infos)
         print()
         print("Oeuvres initialisées")
         self.analyseur = analyseur
@@ -536,6 +846,7 @@ class CrossValidation:
         self.pourcentage_eval = pourcentage_eval
         self.nombre_essais = nombre_essais
         self.leave_one_out = leave_one_out
+        self.equilibrer_plis = equilibrer_plis
         self.createur_classifieur = createur_classifieur
 
     def creer_textes(self, equilibrage = True):
@@ -548,26 +859,38 @@ class CrossValidation:
 
     def analyser(self, normalisation = False):
         """Applique la méthode analyser de l'analyseur : elle remplit les coordonnées du vecteur associé à chaque texte, et calcule le vecteur normalisé."""
-        self.analyseur.analyser(self.liste_textes)
-        D = np.array([texte.vecteur for texte in self.liste_textes])
+        D = self.analyseur.vectoriser(self.liste_textes, self.nb_processus, self.stock_caracteristiques)
         A = D
+        self.normaliseur = None
         if normalisation:
-            A = normaliser1(D)
+            self.normaliseur = Normaliseur().fit(D)
+            A = self.normaliseur.transform(D)
         for k,texte in enumerate(self.liste_textes):
             texte.vecteur = A[k]
         print("Textes analysés et vectorisés")
 
     def valider(self):
-        if self.leave_one_out:
+        """Si equilibrer_plis est vrai (par défaut), le training_set de chaque essai est rééquilibré avec equilibrer1.
+        Pour le leave one out avec equilibrer_plis faux, un classifieur qui a une méthode predictions_leave_one_out (voir Bayes) donne directement, en une passe, la catégorie prédite pour chaque texte par le modèle appris sur tous les autres."""
+        classifieur = self.createur_classifieur()
+        if self.leave_one_out and not self.equilibrer_plis and hasattr(classifieur, "predictions_leave_one_out"):
+            predictions = classifieur.predictions_leave_one_out(self.liste_textes, self.categories)
+            references = np.array([self.categories.index(t.categorie) for t in self.liste_textes])
+            prec = np.mean(predictions == references)
+        elif self.leave_one_out:
             prec = 0
             for i in range(len(self.liste_textes)):
                 print("Texte {} sur {}".format(i+1,len(self.liste_textes)))
                 classifieur = self.createur_classifieur()
                 indices_eval_set = [i]
                 eval_set = [self.liste_textes[i] for i in indices_eval_set]
-                training_set = equilibrer1([self.liste_textes[j] for j in range(len(self.liste_textes)) if j not in indices_eval_set])
+                exclus = set(indices_eval_set)
+                training_set = [self.liste_textes[j] for j in range(len(self.liste_textes)) if j not in exclus]
+                if self.equilibrer_plis:
+                    training_set = equilibrer1(training_set)
                 classifieur.classifier(training_set, eval_set, self.categories)
-                p = ee.precision(classifieur.eval_set, classifieur.p, classifieur.p_ref)
+                p_d = defuzze(classifieur.p)
+                p = ee.precision(classifieur.eval_set, p_d, classifieur.p_ref)
                 prec += p
             prec /= len(self.liste_textes)
         else:
@@ -578,7 +901,10 @@ class CrossValidation:
                 classifieur = self.createur_classifieur()
                 indices_eval_set = random.sample(list(range(len(self.liste_textes))), taille_eval)
                 eval_set = [self.liste_textes[i] for i in indices_eval_set]
-                training_set = equilibrer1([self.liste_textes[j] for j in range(len(self.liste_textes)) if j not in indices_eval_set])
+                exclus = set(indices_eval_set)
+                training_set = [self.liste_textes[j] for j in range(len(self.liste_textes)) if j not in exclus]
+                if self.equilibrer_plis:
+                    training_set = equilibrer1(training_set)
                 classifieur.classifier(training_set, eval_set, self.categories)
                 p_d = defuzze(classifieur.p)
                 p = ee.precision(classifieur.eval_set, p_d, classifieur.p_ref)